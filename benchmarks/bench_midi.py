@@ -0,0 +1,151 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+Benchmark for the MIDI track encoder (midiutil), compares the former implementation
+(bytes concatenation for each event) with the current one (single bytearray, varlen lookup table)
+and checks that both return the same bytes.
+Also compares the memory used by a track held as one list per event (former implementation)
+and as MidiTrackBuffer.
+
+usage: python benchmarks/bench_midi.py [number of events]
+
+"""
+import io
+import random
+import sys
+import timeit
+import tracemalloc
+
+import inkamusic.midiutil as midiutil
+from inkamusic.midiutil import STATUSMSG_INDX, LEN_INDX, TICK_INDX, CHANNEL_INDX, META_COMMAND, DATA_INDX
+
+
+def legacy_write_varlen(value):
+    """former implementation of midiutil.write_varlen, used as reference only"""
+    chr1 = bytes([value & 0x7F])
+    value >>= 7
+    if value:
+        chr2 = bytes([(value & 0x7F) | 0x80])
+        value >>= 7
+        if value:
+            chr3 = bytes([(value & 0x7F) | 0x80])
+            value >>= 7
+            if value:
+                chr4 = bytes([(value & 0x7F) | 0x80])
+                res = chr4 + chr3 + chr2 + chr1
+            else:
+                res = chr3 + chr2 + chr1
+        else:
+            res = chr2 + chr1
+    else:
+        res = chr1
+    return res
+
+
+def legacy_encode_midi_event(event, running_status):
+    """former implementation of the event encoder, used as reference only"""
+    ret = bytes()
+    ret += legacy_write_varlen(event[TICK_INDX])
+
+    data = []
+    if event[LEN_INDX] > 0:
+        for i in range(event[LEN_INDX]):
+            data.append(event[DATA_INDX + i])
+
+    if event[STATUSMSG_INDX] in [0xFF]:  # meta events
+        ret += bytes([event[STATUSMSG_INDX], event[META_COMMAND]])
+        ret += legacy_write_varlen(event[LEN_INDX])
+        ret += bytes(data)
+    elif event[STATUSMSG_INDX] in [0xF0]:  # Sysex events
+        ret += bytes([0xF0])
+        ret += legacy_write_varlen(event[LEN_INDX] + 1)
+        ret += bytes(data)
+        ret += bytes([0xF7])
+    else:
+        if not running_status or running_status[STATUSMSG_INDX] != event[STATUSMSG_INDX] or \
+          running_status[CHANNEL_INDX] != event[CHANNEL_INDX]:
+            running_status = event
+            ret += bytes([(event[STATUSMSG_INDX] | event[CHANNEL_INDX])])
+        ret += bytes(data)
+
+    return ret, running_status
+
+
+def legacy_write_track(midifile, track):
+    """former implementation of midiutil.write_track, used as reference only"""
+    buf = bytes()
+    running_status = None
+    for event in track:
+        encoded, running_status = legacy_encode_midi_event(event, running_status)
+        buf += encoded
+
+    bufbyte = midiutil.encode_track_header(len(buf)) + buf
+    midifile.write(bufbyte)
+
+
+def create_track(num_of_events):
+    """creates a track similar to a long melody track, including all event types and some large ticks"""
+    rndm = random.Random(4711)
+    track = midiutil.MidiTrackBuffer()
+    midiutil.sys_ex_message_gm2(track)
+    midiutil.set_tempo_event(track, bpm=120)
+    midiutil.time_signature_event(track, numerator=4, denominator=4)
+    midiutil.program_change_event(track, channel=0, data=5)
+    while len(track) < num_of_events - 1:
+        channel = rndm.choice([0, 0, 0, 1])
+        pitch = rndm.randint(40, 90)
+        midiutil.note_on_event(track, tick=rndm.choice([0, 30, 240, 720, 20000, 3000000]), channel=channel,
+                               pitch=pitch, velocity=rndm.randint(1, 127))
+        midiutil.note_off_event(track, tick=rndm.randint(1, 1440), channel=channel, pitch=pitch)
+        if rndm.random() < 0.01:
+            midiutil.control_change_event(track, channel=channel, control=10, value=rndm.randint(0, 127))
+    midiutil.end_of_track_event(track)
+    return track
+
+
+def get_memory(create):
+    """returns the memory in bytes allocated by create() and still in use afterwards"""
+    tracemalloc.start()
+    result = create()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return memory
+
+
+def encode(write_track, track):
+    """returns the bytes written by write_track"""
+    midifile = io.BytesIO()
+    write_track(midifile, track)
+    return midifile.getvalue()
+
+
+def main():
+    """runs benchmark"""
+    num_of_events = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    track = create_track(num_of_events)
+    legacy_track = list(track.events())
+    assert encode(legacy_write_track, legacy_track) == encode(midiutil.write_track, track), 'encoded tracks differ'
+    for value in list(range(-300, 70000)) + [2 ** 21 - 1, 2 ** 21, 2 ** 28 - 1, 2 ** 28, 2 ** 35]:
+        assert legacy_write_varlen(value) == midiutil.write_varlen(value), 'varlen differs for ' + str(value)
+
+    print('encoding a track with', len(track), 'events')
+    for name, write_track, events in [('legacy', legacy_write_track, legacy_track),
+                                      ('current', midiutil.write_track, track)]:
+        seconds = min(timeit.repeat(lambda: encode(write_track, events), number=1, repeat=3))
+        print('%-10s %10.3f s %12d events/s' % (name, seconds, len(track) / seconds))
+
+    print('')
+    print('memory per event')
+    for name, create in [('legacy', lambda: list(create_track(num_of_events).events())),
+                         ('current', lambda: create_track(num_of_events))]:
+        print('%-10s %10.1f bytes' % (name, get_memory(create) / len(track)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+Benchmark for the random classes (utilities.Rndm), shows draws per second for
+
+legacy: former implementation, switching the state of the global generator for each draw
+compat: generator object per random class, same values as legacy
+fast:   generator object per random class, faster variants
+
+and for the batched functions (rndm_int_n, ...) of the compat and fast variants
+
+usage: python benchmarks/bench_rndm.py [number of draws]
+
+"""
+import random
+import sys
+import timeit
+
+import inkamusic.utilities as utilities
+import inkamusic.music_parameter as mp
+
+
+class LegacyRndm():
+    """former implementation of utilities.Rndm, used as reference only"""
+
+    def __init__(self, seed):
+        random.seed(a=seed)
+        self.rndm_state = random.getstate()
+
+    def rndm_int(self, lower, upper):
+        """replaces standard randint function"""
+        random.setstate(self.rndm_state)
+        random_value = random.randint(lower, upper)
+        self.rndm_state = random.getstate()
+        return random_value
+
+    def rndm_choice(self, seq, weights=None):
+        """replaces standard choice function"""
+        random.setstate(self.rndm_state)
+        random_value = random.choices(seq, weights)
+        self.rndm_state = random.getstate()
+        return random_value[0]
+
+    def rndm_random(self):
+        """replaces standard random function"""
+        random.setstate(self.rndm_state)
+        random_value = random.random()
+        self.rndm_state = random.getstate()
+        return random_value
+
+    def rndm_gauss_limit(self, param):
+        """replaces standard gauss function and allows to define upper and lower limits"""
+        random.setstate(self.rndm_state)
+        condition = False
+        while not condition:
+            lower = random.gauss(param[0], param[1])
+            if param[2] <= lower <= param[3]:
+                condition = True
+        self.rndm_state = random.getstate()
+        return lower
+
+
+def get_draws(rndm):
+    """returns the draw functions to be measured, as used in the melody, rhythm and humanize loops"""
+    return {'rndm_int': lambda: rndm.rndm_int(1, 100),
+            'rndm_choice': lambda: rndm.rndm_choice([1, 2, 3, 4, 5]),
+            'rndm_choice (weights)': lambda: rndm.rndm_choice([60, 62, 64, 65, 67], [8, 2, 5, 0, 3]),
+            'rndm_random': rndm.rndm_random,
+            'rndm_gauss_limit': lambda: rndm.rndm_gauss_limit(mp.TONE_LENGTH_PARAM),
+            }
+
+
+def get_batch_draws(rndm, num):
+    """returns the batched draw functions to be measured, each draws num values"""
+    return {'rndm_int_n': lambda: rndm.rndm_int_n(1, 100, num),
+            'rndm_choice_n (weights)': lambda: rndm.rndm_choice_n([60, 62, 64, 65, 67], [8, 2, 5, 0, 3], num),
+            'rndm_gauss_limit_n': lambda: rndm.rndm_gauss_limit_n(mp.TONE_LENGTH_PARAM, num),
+            }
+
+
+def check_compat(num_of_draws):
+    """checks that compat mode returns the same values as the former implementation"""
+    legacy = get_draws(LegacyRndm(4711))
+    compat = get_draws(utilities.Rndm(4711))
+    for name in legacy:
+        for _ in range(num_of_draws):
+            assert legacy[name]() == compat[name](), name + ' differs from former implementation'
+
+
+def main():
+    """runs benchmark"""
+    num_of_draws = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+
+    check_compat(1000)
+
+    variants = [('legacy', LegacyRndm(4711)),
+                ('compat', utilities.Rndm(4711)),
+                ('fast', utilities.Rndm(4711, compat=False))]
+
+    print('draws per second,', num_of_draws, 'draws each')
+    print('%-24s' % '' + ''.join('%14s' % name for name, _ in variants))
+    for draw_name in get_draws(variants[0][1]):
+        line = '%-24s' % draw_name
+        for _, rndm in variants:
+            seconds = timeit.timeit(get_draws(rndm)[draw_name], number=num_of_draws)
+            line += '%14d' % (num_of_draws / seconds)
+        print(line)
+
+    batch_size = 100
+    print('')
+    print('batched draws per second,', batch_size, 'values per call')
+    print('%-24s' % '' + ''.join('%14s' % name for name, _ in variants[1:]))
+    for draw_name in get_batch_draws(variants[1][1], batch_size):
+        line = '%-24s' % draw_name
+        for _, rndm in variants[1:]:
+            seconds = timeit.timeit(get_batch_draws(rndm, batch_size)[draw_name], number=num_of_draws // batch_size)
+            line += '%14d' % (num_of_draws / seconds)
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
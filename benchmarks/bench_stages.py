@@ -0,0 +1,159 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+Benchmark for the stages of create_composition (global rhythm, prepare_track_info, composition structure,
+bar distribution, track rhythms, harmony track, each instrument track and create_midi).
+All compositions use fixed seeds, for several lengths (10 s to 30 min) and instrumentations.
+The best time of all repetitions is used for each stage.
+
+The results are written as json file, which may be compared with the results of another commit.
+The md5 of the midi data is part of the results, so changed compositions are detected as well.
+
+usage: python benchmarks/bench_stages.py [--quick] [--repeat N] [--output FILE] [--compare FILE]
+
+"""
+import argparse
+import hashlib
+import io
+import json
+import platform
+import subprocess
+import sys
+import time
+
+import inkamusic
+import inkamusic.batch as batch
+import inkamusic.const as const
+import inkamusic.settings as settings
+import inkamusic.webutilities as webutilities
+
+LENGTHS = [10, 60, 300, 1800]  # seconds
+QUICK_LENGTHS = [10, 60]
+INSTRUMENTATIONS = ['Piano + Bass', 'Strings', 'Random instrumentation']
+SEED_VAL = 1234567
+INSTRU_ID_VAL = 7654321
+MIN_SECONDS = 0.005  # shorter stages are not reported as regressions, their times are not reliable
+
+
+def run_composition(instrumentation, length):
+    """creates one composition, returns stage times, total time, number of bars, instruments and md5 of midi data"""
+    web_settings = dict(batch.get_default_web_settings(), sel_instrumentation=instrumentation)
+    selections = settings.parse_web_selections(web_settings)._replace(length=length)
+    stages = {}
+
+    def stage_time(stage, seconds):
+        stages[stage] = seconds
+
+    start = time.perf_counter()
+    composition = webutilities.prepare_composition(selections, SEED_VAL, INSTRU_ID_VAL, 'benchmark')
+    composition.inka_data['stage_time'] = stage_time
+    midi_stream = io.BytesIO()
+    composition.create_composition(midi_stream)
+    total = time.perf_counter() - start
+
+    instruments = [track[const.TRACK_INFO_INSTRU_DEF_INDX][0] for track in composition.inka_data_2['track_info']]
+    return {'stages': stages,
+            'total': total,
+            'bars': composition.inka_data_2['num_of_bars'],
+            'instruments': instruments,
+            'md5': hashlib.md5(midi_stream.getvalue()).hexdigest(),
+            }
+
+
+def run_benchmark(lengths, repeat):
+    """runs all compositions repeat times, returns list of results"""
+    results = []
+    for instrumentation in INSTRUMENTATIONS:
+        for length in lengths:
+            best = None
+            for _ in range(repeat):
+                result = run_composition(instrumentation, length)
+                if best is None:
+                    best = result
+                else:
+                    assert result['md5'] == best['md5'], 'composition is not reproducible'
+                    best['total'] = min(best['total'], result['total'])
+                    for stage, seconds in result['stages'].items():
+                        best['stages'][stage] = min(best['stages'][stage], seconds)
+            best['instrumentation'] = instrumentation
+            best['length'] = length
+            results.append(best)
+            print('%-24s %6d s %5d bars %8.3f s' % (instrumentation, length, best['bars'], best['total']))
+    return results
+
+
+def get_commit():
+    """returns current git commit, None if not available"""
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare(results, reference_results, threshold):
+    """prints time ratio (current / reference) of all compositions and stages, returns number of regressions"""
+    reference = {(result['instrumentation'], result['length']): result for result in reference_results}
+    regressions = 0
+    print('')
+    print('%-24s %8s %-22s %10s %10s %7s' % ('instrumentation', 'length', 'stage', 'reference', 'current', 'ratio'))
+    for result in results:
+        ref = reference.get((result['instrumentation'], result['length']))
+        if ref is None:
+            continue
+        if ref['md5'] != result['md5']:
+            print('%-24s %8d composition differs from reference' % (result['instrumentation'], result['length']))
+        times = [('total', ref['total'], result['total'])]
+        times += [(stage, ref['stages'][stage], seconds) for stage, seconds in result['stages'].items()
+                  if stage in ref['stages']]
+        for stage, ref_seconds, seconds in times:
+            ratio = seconds / max(ref_seconds, 1e-6)
+            if ratio > threshold and seconds > MIN_SECONDS:
+                regressions += 1
+                flag = '  <--'
+            else:
+                flag = ''
+            if stage == 'total' or flag:
+                print('%-24s %8d %-22s %10.4f %10.4f %7.2f%s' % (result['instrumentation'], result['length'], stage,
+                                                                 ref_seconds, seconds, ratio, flag))
+    return regressions
+
+
+def main():
+    """runs benchmark"""
+    parser = argparse.ArgumentParser(description='benchmark for the stages of create_composition')
+    parser.add_argument('--quick', action='store_true', help='short compositions only (10 s and 1 min)')
+    parser.add_argument('--repeat', type=int, default=3, help='repetitions of each composition (default: 3)')
+    parser.add_argument('--output', help='json file for the results')
+    parser.add_argument('--compare', help='json file with reference results')
+    parser.add_argument('--threshold', type=float, default=1.2,
+                        help='time ratio reported as regression (default: 1.2)')
+    args = parser.parse_args()
+
+    results = run_benchmark(QUICK_LENGTHS if args.quick else LENGTHS, args.repeat)
+    data = {'version': inkamusic.__version__,
+            'commit': get_commit(),
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'seed_val': SEED_VAL,
+            'instru_id_val': INSTRU_ID_VAL,
+            'repeat': args.repeat,
+            'results': results,
+            }
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            json.dump(data, output_file, indent=1)
+
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as reference_file:
+            regressions = compare(results, json.load(reference_file)['results'], args.threshold)
+        print(regressions, 'regressions')
+        sys.exit(1 if regressions else 0)
+
+
+if __name__ == '__main__':
+    main()
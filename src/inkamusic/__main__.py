@@ -1,8 +1,16 @@
 # -*- coding: utf-8 -*-
 
-"""__main__ for Inka Algorithmic Music."""
+"""__main__ for Inka Algorithmic Music.
 
-import inkamusic.startup
+python -m inkamusic          starts the web interface
+python -m inkamusic batch    creates compositions without the web interface, see inkamusic.batch
+"""
 
+import sys
 
-inkamusic.startup.start()
+if len(sys.argv) > 1 and sys.argv[1] == 'batch':
+    import inkamusic.batch
+    inkamusic.batch.main(sys.argv[2:])
+else:
+    import inkamusic.startup
+    inkamusic.startup.start()
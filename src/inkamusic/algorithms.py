@@ -9,7 +9,6 @@ This file contains the main algorithmic functions
 
 """
 import math
-import copy
 import inkamusic.trackinfo_util as tu
 import inkamusic.const as const
 from inkamusic.const import SUB_INDX, PROP_INDX, LEN_INDX, PROP_USEPART, NO_REPEAT
@@ -21,25 +20,27 @@ import inkamusic.music_parameter as mp
 import inkamusic.rhythm_algorithms as rhythm_algorithms
 import inkamusic.utilities as utilities
 
+MAX_INTENSITY = 5
+
 
 def show_bars_and_beats(txt, bars_beats):
     """prints bars and beats entries for debugging purposes"""
     if const.DEBUG_OUTPUT:
         print('Show bars_and_beats:  ', txt)
-        for i in bars_beats:
-            if i[0] == FIRST_BAR_OF_PART:
+        for i in bars_beats.entries:
+            if i.record_type == FIRST_BAR_OF_PART:
                 print(' ')
-                print('    Part starts with first bar number', i[1])
-            elif i[0] == BEAT_RHYTHM:
-                print('      rhythm for beat index', i[1])
-                print('          ', i[2])
-            elif i[0] == BEAT_MELODY:
-                print('      melody for beat index', i[1])
-                print('          rule', i[2])
-                if not i[3]:
+                print('    Part starts with first bar number', i.first_bar)
+            elif i.record_type == BEAT_RHYTHM:
+                print('      rhythm for beat index', i.beat_indx)
+                print('          ', i.rhythm)
+            elif i.record_type == BEAT_MELODY:
+                print('      melody for beat index', i.beat_indx)
+                print('          rule', i.melody_rule)
+                if not i.melody:
                     print('          melody entry is empty')
                 else:
-                    for j, melody_entry in enumerate(i[3]):
+                    for j, melody_entry in enumerate(i.melody):
                         print('          melody entry', j, 'is', melody_entry)
 
 
@@ -60,6 +61,31 @@ def get_last_tones_from_melody(melody, n_th_last_tone):
     return melody[melody_len - n_th_last_tone]
 
 
+def get_volume_table(is_solo_instrument):
+    """returns the MIDI volume of each intensity (0 ... MAX_INTENSITY)"""
+    if is_solo_instrument:
+        volume_level = mp.VOLUME_LEVEL_SOLO
+    else:
+        volume_level = mp.VOLUME_LEVEL_NON_SOLO
+    return [int((intensity - 3) * (mp.SPREAD / MAX_INTENSITY) + volume_level + 0.5)
+            for intensity in range(MAX_INTENSITY + 1)]
+
+
+def get_humanized_positions(positions, humanize_values, humanize_max_in_ticks, part_end_limit):
+    """returns positions shifted by humanize values (in ticks).
+       A position is not shifted, if it would get too near to the previous (humanized) position
+       or to the end of the part"""
+    humanized_positions = []
+    previous_position = 0
+    for original_position, humanize_value in zip(positions, humanize_values):
+        test_position = original_position + int(humanize_value)
+        if test_position <= previous_position + humanize_max_in_ticks or test_position >= part_end_limit:
+            test_position = original_position
+        humanized_positions.append(test_position)
+        previous_position = test_position
+    return humanized_positions
+
+
 # def _change_up_down_equal(c_3, try_counter):
 #     """selects different up down or equal setting if original setting was not possible"""
 #     if try_counter > 0:
@@ -83,16 +109,12 @@ class InkaAlgorithms():
                             'starts_level': -1,  # not yet defined
                             'repeat_from_bar': -1,  # not yet defined
                             'num_bars_in_part': -1,  # not yet defined
-                            'play_or_pause_indx': const.PLAYED_IN_TRACK + self.comp_data['track_id'],
                             'selected_solo_rhythm': -1,  # not yet defined
                             'vari_track_rhythm': -1,   # not yet defined
                             'global_rhythm': [],  # not yet defined
                             'bpm': -1,  # not yet defined
-                            'tones': [],
-                            'positions': [],
-                            'bars_and_beats': [],
-                            'connection_types': [],
-                            'intensities': []
+                            'composed_track': utilities.ComposedTrack(),  # tones, positions, intensities, ...
+                            'bars_and_beats': utilities.BarsAndBeats(),
                             }
         self.comp_data_3 = {'scale': [],  # not yet defined
                             'harmony_class': None,  # not yet defined
@@ -102,6 +124,8 @@ class InkaAlgorithms():
                             'current_beat_harmony_rule': [],  # not yet defined
                             'disharmony_to_harmony_rule': [],  # not yet defined
                             'disharmony_to_used_tones': [],  # not yet defined
+                            'disharmony_key': None,  # not yet defined
+                            'scoring_tables': None,  # not yet defined
                             'up_down_equal_probs': -1,  # not yet defined
                             'melody': [],  # not yet defined CHECK
                             'inst_low': -1,  # not yet defined
@@ -113,7 +137,7 @@ class InkaAlgorithms():
                             'created_bars_so_far': -1,  # not yet defined
                             'envelope_param_b': -1,  # not yet defined
                             'envelope_param_p': -1,  # not yet defined
-                            'harmony_bars_and_beats': [],  # not yet defined
+                            'harmony_bars_and_beats': None,  # not yet defined
                             }
 
     def set_scale(self, scale):
@@ -251,10 +275,7 @@ class InkaAlgorithms():
         # example of used_tones tbd
         # example of scale [7, 65, 0, 2, [1, 0, 2]] (SCALE_LEN, SCALE_COUNT, SCALE_START, SCALE_NOTE, harmonies)
 
-        basic_scale = c_3['basicscale_class'].get_scale_by_index(c_3['scale'][const.SCALE_LEN_INDX],
-                                                                 c_3['scale'][const.SCALE_COUNT_INDX],
-                                                                 c_3['scale'][const.SCALE_START_INDX],
-                                                                 c_3['scale'][const.SCALE_NOTE_INDX])
+        basic_scale = c_3['scoring_tables'].basic_scale
 
         c_3['basic_scale'] = basic_scale
         # example for basic_scale 7 65 with SCALE_START 0 (major pattern) and
@@ -271,16 +292,22 @@ class InkaAlgorithms():
         assert c_3['current_beat_harmony_rule'] != [], "current_beat_harmony_rule can not be empty"
 
         # for each tone in scale: find disharmony to harmony_rule and disharmony to all used tones
-        c_3['disharmony_to_harmony_rule'] = []
-        c_3['disharmony_to_used_tones'] = []
-        for tone in range(12):
-            if basic_scale[tone] == 1:
-                tone_disharmony = find_tone_disharmony_value(tone, c_3['current_beat_harmony_rule'][0][1])
-                c_3['disharmony_to_harmony_rule'].append(tone_disharmony)
-                c_3['disharmony_to_used_tones'].append(find_tone_disharmony_value(tone, used_tones))
-            else:
-                c_3['disharmony_to_harmony_rule'].append(const.NOT_IN_SCALE)
-                c_3['disharmony_to_used_tones'].append(const.NOT_IN_SCALE)
+        # the values only depend on harmony and used tones, so they are calculated once for each combination
+        c_3['disharmony_key'] = (tuple(c_3['current_beat_harmony_rule'][0][1]), tuple(used_tones))
+        disharmony_values = c_3['scoring_tables'].disharmony_values
+        if c_3['disharmony_key'] not in disharmony_values:
+            disharmony_to_harmony_rule = []
+            disharmony_to_used_tones = []
+            for tone in range(12):
+                if basic_scale[tone] == 1:
+                    tone_disharmony = find_tone_disharmony_value(tone, c_3['current_beat_harmony_rule'][0][1])
+                    disharmony_to_harmony_rule.append(tone_disharmony)
+                    disharmony_to_used_tones.append(find_tone_disharmony_value(tone, used_tones))
+                else:
+                    disharmony_to_harmony_rule.append(const.NOT_IN_SCALE)
+                    disharmony_to_used_tones.append(const.NOT_IN_SCALE)
+            disharmony_values[c_3['disharmony_key']] = disharmony_to_harmony_rule, disharmony_to_used_tones
+        c_3['disharmony_to_harmony_rule'], c_3['disharmony_to_used_tones'] = disharmony_values[c_3['disharmony_key']]
 
     def _find_possible_tones(self, previous_tones, target_tone):
         """ finds all tones for an instrument track wich possibly could be used.
@@ -311,8 +338,13 @@ class InkaAlgorithms():
             if tones_available < 12:
                 low_tone = c_3['inst_high'] - 12
 
-        for tone_abs_height in range(low_tone, high_tone + 1):
-            result = utilities.check_tone(tone_abs_height, instrument_type, target_tone, previous_tones, c_3)
+        if const.BATCH_TONE_SCORING:
+            results = utilities.check_tones(low_tone, high_tone, instrument_type, target_tone, previous_tones, c_3)
+        else:
+            results = [utilities.check_tone(tone_abs_height, instrument_type, target_tone, previous_tones, c_3)
+                       for tone_abs_height in range(low_tone, high_tone + 1)]
+
+        for result in results:
             # print('tone_abs_height, result',result[0],round(result[1],0))
             if result[1] > 0:  # final points
                 possible_tones.append(result)
@@ -336,14 +368,13 @@ class InkaAlgorithms():
         if num_tones == 0:
             return []
 
-        population = [possible_tones[i][0] for i in range(0, num_tones)]
-        weights = [possible_tones[i][1] for i in range(0, num_tones)]
-        max_weight = max(weights)
+        population = [possible_tone[0] for possible_tone in possible_tones]
+        max_weight = max(possible_tone[1] for possible_tone in possible_tones)
         assert 0 <= mp.RATING_THRESHOLD <= 100
-        for i, weight in enumerate(weights):
-            if weight < max_weight:
-                if weight < mp.RATING_THRESHOLD * max_weight / 100:
-                    weights[i] = 0
+        # weights below the threshold are set to 0
+        threshold = mp.RATING_THRESHOLD * max_weight / 100
+        weights = [possible_tone[1] if possible_tone[1] >= max_weight or possible_tone[1] >= threshold else 0
+                   for possible_tone in possible_tones]
         tone = self.comp_data['rndm_2'][const.RNDM_MELO_RHYTHM].rndm_choice(population,
                                                                             weights=weights)
         return [tone]
@@ -461,7 +492,7 @@ class InkaAlgorithms():
                               [last_bar or nextto_last_bar, last_bar and tone_i == number_of_tones_in_beat - 1],
                               target_tone)
 
-        one_beat_melody = copy.deepcopy(c_3['melody'])
+        one_beat_melody = c_3['melody']  # a new list for each beat, see above
 
         tone_group_length -= number_of_tones_in_beat
         if tone_group_length <= 0:
@@ -471,40 +502,19 @@ class InkaAlgorithms():
         return [[tone_group_length, c_3['up_down_equal_probs']]], one_beat_melody
 
     def _get_melody_from_bars_and_beats(self, beat_indx, start_from_bar):
-        """gets melody and melody rule for a beat defined by start_bar and beat_indx"""
-        len_bars_and_beats = len(self.comp_data_2['bars_and_beats'])
-        i = 0
-        active = 0
-        while i < len_bars_and_beats:
-            if self.comp_data_2['bars_and_beats'][i][0] == FIRST_BAR_OF_PART:
-                if self.comp_data_2['bars_and_beats'][i][1] == start_from_bar:
-                    active = 1
-                    beat_counter = 0
-
-            if active == 1:
-                if self.comp_data_2['bars_and_beats'][i][0] == BEAT_MELODY:
-                    if beat_counter == beat_indx:
-                        one_beat_melody = copy.deepcopy(self.comp_data_2['bars_and_beats'][i][3])
-                        one_beat_melody_rule = copy.deepcopy(self.comp_data_2['bars_and_beats'][i][2])
-                        break
-                    beat_counter += 1
-            i += 1
-        return one_beat_melody, one_beat_melody_rule
+        """gets melody and melody rule for a beat defined by start_bar and beat_indx.
+           The tones and the melody rule are shared with the entry and must not be changed,
+           the melody is a new list (for the harmony track it holds the used tones, which are added later)"""
+        entry, _ = self.comp_data_2['bars_and_beats'].get_beat(BEAT_MELODY, start_from_bar, beat_indx)
+        return list(entry.melody), entry.melody_rule
 
     def _get_last_harmony_from_bars_and_beats(self):
         """returns the last used harmony"""
 
-        len_bars_and_beats = len(self.comp_data_2['bars_and_beats'])
-        i = len_bars_and_beats-1
+        entry = self.comp_data_2['bars_and_beats'].get_last(BEAT_MELODY)
         one_beat_melody_rule = []
-
-        while i >= 0:
-            if self.comp_data_2['bars_and_beats'][i][0] == BEAT_MELODY:
-
-                one_beat_melody_rule = self.comp_data_2['bars_and_beats'][i][2]
-                break
-
-            i -= 1
+        if entry is not None:
+            one_beat_melody_rule = entry.melody_rule
         return one_beat_melody_rule
 
     def _get_nth_last_tone_from_bars_and_beats(self, n_from_end):
@@ -513,81 +523,42 @@ class InkaAlgorithms():
            than one tone.
            The maximum number of beats this function searches backward from the end is n_from_end * 4"""
 
-        len_bars_and_beats = len(self.comp_data_2['bars_and_beats'])
-        i = len_bars_and_beats-1
         one_beat_melody = []
         find = n_from_end
         max_beats_backward = 0
-        while i >= 0:
-            if self.comp_data_2['bars_and_beats'][i][0] == BEAT_MELODY:
-                max_beats_backward += 1
-                num_of_tones_in_beat = len(self.comp_data_2['bars_and_beats'][i][3])
-                if num_of_tones_in_beat >= find:
-                    one_beat_melody = self.comp_data_2['bars_and_beats'][i][3][num_of_tones_in_beat - find]
-                    break
-                if max_beats_backward > n_from_end * 4:
-                    break
-                else:
-                    find -= num_of_tones_in_beat
-            i -= 1
+        entry = self.comp_data_2['bars_and_beats'].get_nth_last(BEAT_MELODY, 1)
+        while entry is not None:
+            max_beats_backward += 1
+            num_of_tones_in_beat = len(entry.melody)
+            if num_of_tones_in_beat >= find:
+                one_beat_melody = entry.melody[num_of_tones_in_beat - find]
+                break
+            if max_beats_backward > n_from_end * 4:
+                break
+            else:
+                find -= num_of_tones_in_beat
+            entry = self.comp_data_2['bars_and_beats'].get_nth_last(BEAT_MELODY, max_beats_backward + 1)
         return one_beat_melody
 
     def _get_harmony_from_bars_and_beats(self, beat_indx, start_from_bar):
         """gets harmony rule and used tones for a beat defined by start_bar and beat_indx"""
 
-        c_3 = self.comp_data_3
-
-        one_beat_harmony_rule = []
-        len_bars_and_beats = len(c_3['harmony_bars_and_beats'])
-        i = 0
-        active = 0
-        while i < len_bars_and_beats:
-            if c_3['harmony_bars_and_beats'][i][0] == FIRST_BAR_OF_PART:
-                if c_3['harmony_bars_and_beats'][i][1] == start_from_bar:
-                    active = 1
-                    beat_counter = 0
-
-            if active == 1:
-                if c_3['harmony_bars_and_beats'][i][0] == BEAT_MELODY:
-                    #  example for c_3['harmony_bars_and_beats'][i]
-                    # [-5, 0, [[9, [4, 7, 11], 0]], []]
-                    # [BEAT_MELODY, beat_indx, [harmony rule], used tones]
-                    # [harmony rule] = [constant for new harmony, specific harmony, harmony type]
-
-                    if beat_counter == beat_indx:
-                        one_beat_harmony_rule = c_3['harmony_bars_and_beats'][i][2]
-                        used_tones = c_3['harmony_bars_and_beats'][i][3]
-                        break
-                    beat_counter += 1
-            i += 1
+        #  example for an entry of harmony bars and beats
+        # [-5, 0, [[9, [4, 7, 11], 0]], []]
+        # [BEAT_MELODY, beat_indx, [harmony rule], used tones]
+        # [harmony rule] = [constant for new harmony, specific harmony, harmony type]
+        entry, _ = self.comp_data_3['harmony_bars_and_beats'].get_beat(BEAT_MELODY, start_from_bar, beat_indx)
+        one_beat_harmony_rule = entry.melody_rule
+        used_tones = entry.melody
         return one_beat_harmony_rule, used_tones
 
     def _add_as_used_tone_to_harmony_track(self, beat_indx, start_from_bar, tone):
         """adds a tone as used tone to harmony entry"""
         # ex tone is [60, 64, 67]
-        c_3 = self.comp_data_3
-        len_bars_and_beats = len(c_3['harmony_bars_and_beats'])
-        i = 0
-        active = False
-        while i < len_bars_and_beats:
-            if c_3['harmony_bars_and_beats'][i][0] == FIRST_BAR_OF_PART:
-                if c_3['harmony_bars_and_beats'][i][1] == start_from_bar:
-                    active = True
-                    beat_counter = 0
-
-            if active and c_3['harmony_bars_and_beats'][i][0] == BEAT_MELODY:
-                #  example for c_3['harmony_bars_and_beats'][i][0]
-                # [-5, 0, [[9, [6, 10, 1], 1]], []]
-                # [BEAT_MELODY, beat_indx, [harmony rule], used tones]
-
-                if beat_counter == beat_indx:
-
-                    for j in tone:
-                        if j % 12 not in c_3['harmony_bars_and_beats'][i][3]:
-                            c_3['harmony_bars_and_beats'][i][3].append(j % 12)
-                    break
-                beat_counter += 1
-            i += 1
+        entry, _ = self.comp_data_3['harmony_bars_and_beats'].get_beat(BEAT_MELODY, start_from_bar, beat_indx)
+        for j in tone:
+            if j % 12 not in entry.melody:
+                entry.melody.append(j % 12)
 
     def _get_envelope_val(self, beat_indx):
         """ returns value between -1 ... +1 indicating the height level to be used"""
@@ -653,27 +624,27 @@ class InkaAlgorithms():
 
             one_beat_melody, one_beat_melody_rule = \
               self._get_melody_from_bars_and_beats(beat_indx, self.comp_data_2['repeat_from_bar'])
-            one_beat_melody_rule[0][0] = RM_REPEAT
+            one_beat_melody_rule = [[RM_REPEAT] + one_beat_melody_rule[0][1:]]
 
         elif melody_rule == const.RM_HARMONY_TRACK_NEW_HARMO:
             one_beat_melody_rule, one_beat_melody = \
               self._choose_new_harmony(anchor_harmony_needed,
-                                       c_3['bar_distribution'][actual_global_bar_num][const.HARMONY_IDENTIFIER])
+                                       c_3['bar_distribution'][actual_global_bar_num].harmony_type)
             # example: one_beat_melody_rule = [[9, [4, 7, 11], 0]]
-            #          c_3['bar_distribution'][actual_global_bar_num][const.HARMONY_IDENTIFIER] = 0
+            #          c_3['bar_distribution'][actual_global_bar_num].harmony_type = 0
 
         elif melody_rule == const.RM_HARMONY_TRACK_LAST_HARMO:
             one_beat_melody, one_beat_melody_rule = \
               self._get_melody_from_bars_and_beats(beat_indx - 1, self.comp_data_2['num_of_first_bar'])
 
             # check if harmony type is still correct, otherwise choose new harmony
-            if one_beat_melody_rule[0][2] != c_3['bar_distribution'][actual_global_bar_num][const.HARMONY_IDENTIFIER]:
+            if one_beat_melody_rule[0][2] != c_3['bar_distribution'][actual_global_bar_num].harmony_type:
                 one_beat_melody_rule, one_beat_melody = \
                   self._choose_new_harmony(False,
-                                           c_3['bar_distribution'][actual_global_bar_num][const.HARMONY_IDENTIFIER])
+                                           c_3['bar_distribution'][actual_global_bar_num].harmony_type)
                 one_beat_melody_rule[0][0] = const.RM_HARMONY_TRACK_NEW_HARMO
             else:
-                one_beat_melody_rule[0][0] = const.RM_HARMONY_TRACK_LAST_HARMO
+                one_beat_melody_rule = [[const.RM_HARMONY_TRACK_LAST_HARMO] + one_beat_melody_rule[0][1:]]
 
         return one_beat_melody_rule, one_beat_melody
 
@@ -756,12 +727,12 @@ class InkaAlgorithms():
                 melody_rule = const.RM_MELODY
 
             one_beat_melody_rule, one_beat_melody = self._melody_generator(beat_indx, melody_rule)
-            append_tuple = [BEAT_MELODY, beat_indx, one_beat_melody_rule, one_beat_melody]
-            self.comp_data_2['bars_and_beats'].append(append_tuple)
+            self.comp_data_2['bars_and_beats'].append(utilities.BeatMelody(BEAT_MELODY, beat_indx,
+                                                                           one_beat_melody_rule, one_beat_melody))
             if self.comp_data['track_id'] == const.HARMONY_TRACK:
                 assert one_beat_melody == [], "no melody for harmony track"
             for tones in one_beat_melody:
-                self.comp_data_2['tones'].append(tones)
+                self.comp_data_2['composed_track'].append_tones(tones)
 
             beat_indx += 1
 
@@ -777,9 +748,8 @@ class InkaAlgorithms():
         self.comp_data_2['num_of_first_bar'] = c_strct[PROP_INDX][PROP_ACTUAL_BAR]
         self.comp_data_2['ends_level'] = c_strct[PROP_INDX][PROP_END]
         self.comp_data_2['starts_level'] = c_strct[PROP_INDX][PROP_START]
-        append_tuple = [FIRST_BAR_OF_PART, self.comp_data_2['num_of_first_bar']]
-
-        self.comp_data_2['bars_and_beats'].append(append_tuple)
+        self.comp_data_2['bars_and_beats'].append(utilities.FirstBarOfPart(FIRST_BAR_OF_PART,
+                                                                           self.comp_data_2['num_of_first_bar']))
 
         self.comp_data_2['num_of_beats'] = self.comp_data_2['global_rhythm'][const.NUM_OF_BEATS_INDX]
 
@@ -801,42 +771,34 @@ class InkaAlgorithms():
 
             # connection_types
 
-            for i in pos_conn_intens:
-                self.comp_data_2['connection_types'].append(i[2])
+            self.comp_data_2['composed_track'].connection_types.extend(i[2] for i in pos_conn_intens)
 
             # intensities
-            max_intens = 5
-            for i in pos_conn_intens:
-                intensity = i[1]
-                assert 0 <= intensity <= max_intens
-                if tu.is_solo_instrument(self.comp_data['track_info']):
-                    volume = int((intensity - 3) * (mp.SPREAD / max_intens) + mp.VOLUME_LEVEL_SOLO + 0.5)
-                else:
-                    volume = int((intensity - 3) * (mp.SPREAD / max_intens) + mp.VOLUME_LEVEL_NON_SOLO + 0.5)
-                self.comp_data_2['intensities'].append(volume)
+            intensities = [i[1] for i in pos_conn_intens]
+            if intensities:
+                assert min(intensities) >= 0, "intensity < 0"
+                assert max(intensities) <= MAX_INTENSITY, "intensity > MAX_INTENSITY"
+            volume_table = get_volume_table(tu.is_solo_instrument(self.comp_data['track_info']))
+            self.comp_data_2['composed_track'].intensities.extend(volume_table[intensity] for intensity in intensities)
 
     def humanize_positions(self, pos_conn_intens):
         """humanizes all positions"""
-        previous_position = 0
         assert self.comp_data_2['num_of_first_bar'] != 0, "num_of_first_bar is never 0"
         part_offset = (self.comp_data_2['num_of_first_bar']
                        - 1) * const.TICKSRES * self.comp_data_2['num_of_beats']
 
         humanize_max_in_ticks = (const.HUMANIZE_MAX_IN_MS * const.TICKSRES * self.comp_data_2['bpm']) / 60000
         gauss_delta = 2.0 / 3.0 * humanize_max_in_ticks
-        for i in pos_conn_intens:
-            humanize_in_ticks = int(self.comp_data['rndm_2'][const.RNDM_OTHER].rndm_gauss_limit(
-                [0, gauss_delta, -humanize_max_in_ticks, humanize_max_in_ticks]))
-
-            original_position = part_offset + i[0]
-            test_position = original_position + humanize_in_ticks
-            if test_position <= previous_position + humanize_max_in_ticks:
-                test_position = original_position
-            if test_position >= (part_offset + self.comp_data_2['num_bars_in_part'] *
-                                 self.comp_data_2['num_of_beats'] * const.TICKSRES - humanize_max_in_ticks):
-                test_position = original_position
-            self.comp_data_2['positions'].append(test_position)
-            previous_position = test_position
+        part_end_limit = (part_offset + self.comp_data_2['num_bars_in_part'] *
+                          self.comp_data_2['num_of_beats'] * const.TICKSRES - humanize_max_in_ticks)
+
+        # draw all humanize values of the part at once
+        humanize_values = self.comp_data['rndm_2'][const.RNDM_OTHER].rndm_gauss_limit_n(
+            [0, gauss_delta, -humanize_max_in_ticks, humanize_max_in_ticks], len(pos_conn_intens))
+
+        self.comp_data_2['composed_track'].positions.extend(
+            get_humanized_positions([part_offset + i[0] for i in pos_conn_intens], humanize_values,
+                                    humanize_max_in_ticks, part_end_limit))
 
     def walk_structure(self, c_strct, level):
         """
@@ -873,6 +835,12 @@ class InkaAlgorithms():
         level = 1  # start on level 1 (level 0 never contains creatable parts)
         c_3['created_bars_so_far'] = 0  # number of bars which have been composed (created), not including repeated bars
         c_3['envelope_param_b'], c_3['envelope_param_p'] = self._get_envelope_param()
+        if self.comp_data['track_id'] != const.HARMONY_TRACK:
+            basic_scale = c_3['basicscale_class'].get_scale_by_index(c_3['scale'][const.SCALE_LEN_INDX],
+                                                                     c_3['scale'][const.SCALE_COUNT_INDX],
+                                                                     c_3['scale'][const.SCALE_START_INDX],
+                                                                     c_3['scale'][const.SCALE_NOTE_INDX])
+            c_3['scoring_tables'] = utilities.ToneScoringTables(c_3['scale'], basic_scale)
 
         self.walk_structure(self.comp_data['composition_struct'][SUB_INDX], level)
 
@@ -892,29 +860,17 @@ class InkaAlgorithms():
                 print(' ')
                 print('Now starts new track, ID =', self.comp_data['track_id'])
         else:
-            c_3['harmony_bars_and_beats'] = []
+            c_3['harmony_bars_and_beats'] = utilities.BarsAndBeats()
             if const.DEBUG_OUTPUT:
                 print(' ')
                 print('Now starts harmony track')
 
         self.createmelody()
 
-    def gettones(self):
-        """returns melody tone heights"""
-        return self.comp_data_2['tones']
-
-    def getintensities(self):
-        """returns intensities"""
-        return self.comp_data_2['intensities']
+    def get_composed_track(self):
+        """returns tone heights, positions, intensities and connection types (utilities.ComposedTrack)"""
+        return self.comp_data_2['composed_track']
 
     def get_bars_and_beats(self):
         """returns bars_and_beats data structure"""
         return self.comp_data_2['bars_and_beats']
-
-    def getconnection_types(self):
-        """returns connection types"""
-        return self.comp_data_2['connection_types']
-
-    def getpositions(self):
-        """returns positions"""
-        return self.comp_data_2['positions']
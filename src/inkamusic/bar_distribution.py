@@ -8,16 +8,27 @@ Copyright (C) 2018  Udo Wollschläger
 This file creates the bar distribution
 
 """
-import random
 import inkamusic.const as const
 
 from inkamusic.const import BAR_GROUP
-from inkamusic.const import USED_HOW_OFTEN, CREATE_TYPE_IDENTIFIER, GROUP_IDENTIFIER, PLAYED_IN_TRACK
 import inkamusic.music_parameter as mp
 import inkamusic.trackinfo_util as tu
 import inkamusic.settings as settings
 
 
+class BarDistributionEntry():
+    """information about one bar of a composition"""
+
+    __slots__ = ('used_how_often', 'group', 'create_type', 'harmony_type', 'played_in_track')
+
+    def __init__(self):
+        self.used_how_often = 0  # how often is the bar used within the composition, 0 for a repeated bar
+        self.group = 0  # global number of bar starting the group of bars in which the bar is first used
+        self.create_type = 0  # create type of bar
+        self.harmony_type = None  # harmony type of bar, see set_bar_harmony_type
+        self.played_in_track = []  # for each track: 1 if bar is played, 0 if paused, see set_paused_bars
+
+
 class BarDistribution():
     """keeps information about each bar of a composition"""
 
@@ -31,13 +42,13 @@ class BarDistribution():
         if const.DEBUG_OUTPUT:
             print(' ')
             for i in range(1, len(self.bar_distribution)):  # bar numbers start at 1, index 0 not used
-                if self.bar_distribution[i][USED_HOW_OFTEN] == 0:  # bar is a repeated bar
+                if self.bar_distribution[i].used_how_often == 0:  # bar is a repeated bar
                     print('bar', i, ' (not created)')
                 else:
-                    print('bar', i, ' is used', self.bar_distribution[i][USED_HOW_OFTEN],
-                          'times, bar is part of group starting at bar', self.bar_distribution[i][1])
-                    print('       harmony type is', self.bar_distribution[i][const.HARMONY_IDENTIFIER])
-                    print('       create type is', self.bar_distribution[i][CREATE_TYPE_IDENTIFIER])
+                    print('bar', i, ' is used', self.bar_distribution[i].used_how_often,
+                          'times, bar is part of group starting at bar', self.bar_distribution[i].group)
+                    print('       harmony type is', self.bar_distribution[i].harmony_type)
+                    print('       create type is', self.bar_distribution[i].create_type)
 
     def create_bar_distribution(self, bar_struct):
         """ This functions counts for each created (i. e. not repeated) bar, how often this
@@ -46,22 +57,18 @@ class BarDistribution():
         in set_paused_bars and set_bar_harmony_type
 
         """
-        const.ORIGINAL_BAR_NUM_INDX = 3
-        bar_distri = [[0, 0, 0]]  # index 0 not used
-
-        for _ in range(1, self.c_2['num_of_bars'] + 1):
-            bar_distri.append([0, 0, 0])
+        bar_distri = [BarDistributionEntry() for _ in range(self.c_2['num_of_bars'] + 1)]  # index 0 not used
 
         for bar_struct_entry in bar_struct:
-            if bar_struct_entry[0] == BAR_GROUP:
-                currentgroup = bar_struct_entry[1]
+            if bar_struct_entry.record_type == BAR_GROUP:
+                currentgroup = bar_struct_entry.first_bar
             else:
-                barnum = bar_struct_entry[const.ORIGINAL_BAR_NUM_INDX]
-                bar_distri[barnum][USED_HOW_OFTEN] += 1
-                if bar_distri[barnum][GROUP_IDENTIFIER] == 0:  # group undefined
-                    bar_distri[barnum][GROUP_IDENTIFIER] = currentgroup
-                if bar_distri[barnum][CREATE_TYPE_IDENTIFIER] == 0:
-                    bar_distri[barnum][CREATE_TYPE_IDENTIFIER] = bar_struct_entry[const.CREATE_TYPE_INDX]
+                bar_entry = bar_distri[bar_struct_entry.original_bar_num]
+                bar_entry.used_how_often += 1
+                if bar_entry.group == 0:  # group undefined
+                    bar_entry.group = currentgroup
+                if bar_entry.create_type == 0:
+                    bar_entry.create_type = bar_struct_entry.create_type
 
         self.bar_distribution = bar_distri
 
@@ -71,7 +78,7 @@ class BarDistribution():
         """sets the harmony type for all normal bars, i. e. not the first, last and second-last bar"""
         for bar_num in range(2, self.c_2['num_of_bars'] - 1):
 
-            num_used = self.bar_distribution[bar_num][USED_HOW_OFTEN]
+            num_used = self.bar_distribution[bar_num].used_how_often
             found = []
             if num_used != 0:
                 # check if one or more harmony types need exactly this number of bars
@@ -101,11 +108,7 @@ class BarDistribution():
 
     def set_harmony_type(self, bar_num, harmony_type):
         """sets the harmony type for a specific bar"""
-        maxindex = len(self.bar_distribution[bar_num]) - 1
-        if maxindex < const.SCALE_HARMONY_TYPES_INDX:
-            self.bar_distribution[bar_num].append(harmony_type)
-        else:
-            self.bar_distribution[bar_num][const.SCALE_HARMONY_TYPES_INDX] = harmony_type
+        self.bar_distribution[bar_num].harmony_type = harmony_type
 
     def set_bar_harmony_type(self):
         """sets the harmony type for each bar"""
@@ -141,13 +144,13 @@ class BarDistribution():
 
         # use first harmony entry for first, last and second last bar
         self.set_harmony_type(1, harmony_list[0])
-        num_of_bars_currently_assigned[0] += self.bar_distribution[1][USED_HOW_OFTEN]
+        num_of_bars_currently_assigned[0] += self.bar_distribution[1].used_how_often
         if self.c_2['num_of_bars'] > 1:
             self.set_harmony_type(self.c_2['num_of_bars'], harmony_list[0])
-            num_of_bars_currently_assigned[0] += self.bar_distribution[self.c_2['num_of_bars']][USED_HOW_OFTEN]
+            num_of_bars_currently_assigned[0] += self.bar_distribution[self.c_2['num_of_bars']].used_how_often
         if self.c_2['num_of_bars'] > 2:
             self.set_harmony_type(self.c_2['num_of_bars'] - 1, harmony_list[0])
-            num_of_bars_currently_assigned[0] += self.bar_distribution[self.c_2['num_of_bars'] - 1][USED_HOW_OFTEN]
+            num_of_bars_currently_assigned[0] += self.bar_distribution[self.c_2['num_of_bars'] - 1].used_how_often
 
         if self.c_2['num_of_bars'] > 3:
             self.set_non_special_bars_harmony_types(harmony_list, num_of_bars_to_reach, num_of_bars_currently_assigned)
@@ -159,25 +162,17 @@ class BarDistribution():
 
     def init_play_state(self, track):
         """resets the play state for all bars for one  or all tracks"""
-        if track == -1:  # all tracks
-            first = 0
-            last = self.c_2['number_of_tracks']
-        else:
-            first = track
-            last = track + 1
-        for track_num in range(first, last):
-            for bar_num in range(1, self.c_2['num_of_bars'] + 1):
-                if self.bar_distribution[bar_num][USED_HOW_OFTEN] != 0:  # not for repeated bars
-                    maxindex = len(self.bar_distribution[bar_num]) - 1
-                    if maxindex < (PLAYED_IN_TRACK + track_num):
-                        self.bar_distribution[bar_num].append(1)
-                    else:
-                        self.bar_distribution[bar_num][(PLAYED_IN_TRACK + track_num)] = 1
+        for bar_num in range(1, self.c_2['num_of_bars'] + 1):
+            if self.bar_distribution[bar_num].used_how_often != 0:  # not for repeated bars
+                if track == -1:  # all tracks
+                    self.bar_distribution[bar_num].played_in_track = [1] * self.c_2['number_of_tracks']
+                else:
+                    self.bar_distribution[bar_num].played_in_track[track] = 1
 
     def check_non_pause_in_other_tracks(self, current_index_in_all_tracks, choose_bar, all_tracks):
         """checks if bar is not paused in another track"""
         for i in range(current_index_in_all_tracks):
-            if self.bar_distribution[choose_bar][(PLAYED_IN_TRACK + all_tracks[i])] == 1:
+            if self.bar_distribution[choose_bar].played_in_track[all_tracks[i]] == 1:
                 # not paused in this track
                 return True
         return False
@@ -189,24 +184,25 @@ class BarDistribution():
             # count number of bars
             cr_type_bars = 0
             for bar_num in range(1, self.c_2['num_of_bars'] + 1):
-                cr_type = self.bar_distribution[bar_num][CREATE_TYPE_IDENTIFIER]
+                cr_type = self.bar_distribution[bar_num].create_type
                 if cr_type == current_cr_type:  # no pause
                     cr_type_bars += 1
             # choose number of bars to pause even if cr type is correct
             cr_type_bars_to_pause = mp.PERC_CR_BARS_PAUSES * cr_type_bars // 100
 
             for bar_num in range(1, self.c_2['num_of_bars'] + 1):
-                if self.bar_distribution[bar_num][USED_HOW_OFTEN] != 0:  # not for repeated bars
-                    cr_type = self.bar_distribution[bar_num][CREATE_TYPE_IDENTIFIER]
+                bar_entry = self.bar_distribution[bar_num]
+                if bar_entry.used_how_often != 0:  # not for repeated bars
+                    cr_type = bar_entry.create_type
                     if cr_type == current_cr_type:  # no pause
                         if cr_type_bars_to_pause > 0 and \
                           self.inka_data['rndm_2'][const.RNDM_MELO_RHYTHM].rndm_int(1, 100) < mp.PERC_CR_BARS_PAUSES:
                             cr_type_bars_to_pause -= 1
-                            self.bar_distribution[bar_num][(PLAYED_IN_TRACK + track)] = 0
+                            bar_entry.played_in_track[track] = 0
                         else:
-                            self.bar_distribution[bar_num][(PLAYED_IN_TRACK + track)] = 1
+                            bar_entry.played_in_track[track] = 1
                     elif cr_type not in special_cr:
-                        self.bar_distribution[bar_num][(PLAYED_IN_TRACK + track)] = 0
+                        bar_entry.played_in_track[track] = 0
 
     def do_percent_type_pause(self, pause, track, all_tracks, current_index_in_all_tracks):
         """sets random pauses in tracks depending on pause setting for track and
@@ -225,22 +221,22 @@ class BarDistribution():
             # - 2: never  pause last 2 bars
             choose_bar = self.inka_data['rndm_2'][const.RNDM_MELO_RHYTHM].rndm_int(1,
                                                                                    self.c_2['num_of_bars'] - 2)
-            if self.bar_distribution[choose_bar][USED_HOW_OFTEN] == 0:  # repeated bar, don't use
+            if self.bar_distribution[choose_bar].used_how_often == 0:  # repeated bar, don't use
                 continue
-            elif self.bar_distribution[choose_bar][(PLAYED_IN_TRACK + track)] == 1:  # not yet paused
+            elif self.bar_distribution[choose_bar].played_in_track[track] == 1:  # not yet paused
                 non_pause_found = self.check_non_pause_in_other_tracks(current_index_in_all_tracks,
                                                                        choose_bar,
                                                                        all_tracks)
                 if non_pause_found or counter2 > 4 * self.c_2['num_of_bars']:
-                    add = self.bar_distribution[choose_bar][USED_HOW_OFTEN]
+                    add = self.bar_distribution[choose_bar].used_how_often
                     if actual_number_of_paused_bars + add >= min_number_of_paused_bars and  \
                        actual_number_of_paused_bars + add <= max_number_of_paused_bars:
                         actual_number_of_paused_bars += add
-                        self.bar_distribution[choose_bar][(PLAYED_IN_TRACK + track)] = 0
+                        self.bar_distribution[choose_bar].played_in_track[track] = 0
                         num_of_paused_bars_ok = True
                     elif actual_number_of_paused_bars + add < min_number_of_paused_bars:
                         actual_number_of_paused_bars += add
-                        self.bar_distribution[choose_bar][(PLAYED_IN_TRACK + track)] = 0
+                        self.bar_distribution[choose_bar].played_in_track[track] = 0
 
             counter += 1
             counter2 += 1
@@ -270,14 +266,14 @@ class BarDistribution():
         only_perc = 0
 
         for bar_num in range(1, self.c_2['num_of_bars'] + 1):
-            if self.bar_distribution[bar_num][USED_HOW_OFTEN] != 0:  # no repeat
+            if self.bar_distribution[bar_num].used_how_often != 0:  # no repeat
                 playsum = 0
                 non_perc_playsum = 0
-                for j in range(PLAYED_IN_TRACK, PLAYED_IN_TRACK + self.c_2['number_of_tracks']):
+                for track, played in enumerate(self.bar_distribution[bar_num].played_in_track):
 
-                    playsum += self.bar_distribution[bar_num][j]
-                    if tu.is_melody_instrument(self.c_2['track_info'][j - PLAYED_IN_TRACK]):
-                        non_perc_playsum += self.bar_distribution[bar_num][j]
+                    playsum += played
+                    if tu.is_melody_instrument(self.c_2['track_info'][track]):
+                        non_perc_playsum += played
 
                 if playsum == 0:
                     silent_bars += 1
@@ -330,7 +326,7 @@ class BarDistribution():
             self.init_play_state(-1)  # initialise for all tracks
 
             non_perc_tracks = list(range(0, max_non_percussion_track + 1))
-            random.shuffle(non_perc_tracks)
+            self.inka_data['rndm_2'][const.RNDM_OTHER].rndm_shuffle(non_perc_tracks)
 
             # all_tracks will contain a list of all tracks, with non-percussion tracks shuffled
             all_tracks = [] + non_perc_tracks
@@ -340,3 +336,5 @@ class BarDistribution():
             self.set_pause_for_all_tracks(all_tracks, pause)
 
             silent_bars_found = self.check_for_silent_bars(count_silent)
+
+        self.c_2['try_counts']['paused_bars'] = count_silent
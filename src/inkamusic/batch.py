@@ -0,0 +1,198 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+This file contains the batch mode, which creates many compositions without the web interface
+
+usage: python -m inkamusic batch --seeds 1000-1999 [menu options] [--workers N] [--output DIR]
+       python -m inkamusic batch --manifest FILE.csv|FILE.jsonl [--workers N] [--output DIR]
+
+Each manifest entry (csv row or json object) contains seed and optionally instru_id and any of the
+web interface fields sel_instrumentation, sel_percussion, sel_scales, sel_rhythms, sel_lengthmin, sel_lengthsec
+and sel_speed. Missing fields use the default menu selections, a missing instru_id is the same as seed.
+
+A midi file is written for each composition and a line is added to index.jsonl in the output directory
+(file, seed, instru_id, bpm, bars, tracks, seconds and error, if the composition failed).
+Compositions already found in index.jsonl are skipped, so an interrupted batch continues where it stopped.
+
+"""
+
+import argparse
+import concurrent.futures
+import csv
+import io
+import json
+import os
+import sys
+import time
+
+import inkamusic.cache as cache
+import inkamusic.jobs as jobs
+import inkamusic.menu_entries as me
+import inkamusic.music_parameter as mp
+import inkamusic.settings as settings
+import inkamusic.webutilities as webutilities
+
+INDEX_FILE = 'index.jsonl'
+
+# command line options for the web interface fields, with the menu list of each field
+MENU_OPTIONS = [('--instrumentation', 'sel_instrumentation', me.INSTRUMENTATION_LIST),
+                ('--percussion', 'sel_percussion', me.PERCUSSION_LIST),
+                ('--scale', 'sel_scales', me.SCALES_LIST),
+                ('--rhythm', 'sel_rhythms', me.RHYTHM_LIST),
+                ('--length-min', 'sel_lengthmin', me.LENGTH_MIN),
+                ('--length-sec', 'sel_lengthsec', me.LENGTH_SEC),
+                ('--speed', 'sel_speed', me.SPEED_LIST),
+                ]
+
+
+def get_default_web_settings():
+    """returns the web interface fields for the default menu selections"""
+    return {field: menu_list[mp.MENU_INIT[indx]][0] for indx, (_, field, menu_list) in enumerate(MENU_OPTIONS)}
+
+
+def parse_seed_range(txt):
+    """returns range of seeds for '1000-1999' or '1000'"""
+    first, _, last = txt.partition('-')
+    return range(int(first), int(last or first) + 1)
+
+
+def read_manifest(file_name):
+    """returns list of entries (dicts) from csv or jsonl manifest"""
+    with open(file_name, newline='', encoding='utf-8') as manifest:
+        if file_name.endswith('.csv'):
+            return list(csv.DictReader(manifest))
+        return [json.loads(line) for line in manifest if line.strip()]
+
+
+def get_entries(args):
+    """returns list of (web settings, seed, instrumentation id) for all compositions of the batch"""
+    default_web_settings = get_default_web_settings()
+    for option, field, _ in MENU_OPTIONS:
+        value = getattr(args, option[2:].replace('-', '_'))
+        if value is not None:
+            default_web_settings[field] = value
+
+    if args.manifest is None:
+        return [(default_web_settings, seed, seed if args.instru_id is None else args.instru_id)
+                for seed in parse_seed_range(args.seeds)]
+
+    entries = []
+    for row, entry in enumerate(read_manifest(args.manifest), 1):
+        web_settings = dict(default_web_settings)
+        try:
+            web_settings.update({field: entry[field] for _, field, _ in MENU_OPTIONS if entry.get(field)})
+            seed = int(entry['seed'])
+            entries.append((web_settings, seed, int(entry.get('instru_id') or seed)))
+        except (AttributeError, KeyError, TypeError, ValueError) as err:
+            print('manifest entry', row, 'skipped:', repr(err))
+    return entries
+
+
+def read_index(output_dir):
+    """returns file names of all finished compositions in index file. Failed compositions and compositions whose
+       midi file is missing are not finished (they are created again), a partly written last line is ignored"""
+    finished = set()
+    index_file_name = os.path.join(output_dir, INDEX_FILE)
+    if os.path.exists(index_file_name):
+        with open(index_file_name, encoding='utf-8') as index_file:
+            for line in index_file:
+                try:
+                    record = json.loads(line)
+                    if 'error' not in record and os.path.exists(os.path.join(output_dir, record['file'])):
+                        finished.add(record['file'])
+                except (ValueError, KeyError, TypeError):
+                    pass
+    return finished
+
+
+def compose_file(selections, seed_val, instru_id_val, file_name):
+    """creates a composition and writes it to file_name, returns the index entry. Called by a worker process"""
+    record = {'file': os.path.basename(file_name), 'seed': seed_val, 'instru_id': instru_id_val}
+    start = time.time()
+    try:
+        current_composition = webutilities.prepare_composition(selections, seed_val, instru_id_val,
+                                                               record['file'][:-4])
+        midi_stream = io.BytesIO()
+        current_composition.create_composition(midi_stream)
+        # write to a temporary file first, a partly written file must never be used
+        with open(file_name + '.tmp', 'wb') as midi_file:
+            midi_file.write(midi_stream.getvalue())
+        os.replace(file_name + '.tmp', file_name)
+        record['bpm'] = current_composition.inka_data_2['bpm']
+        record['bars'] = current_composition.inka_data_2['num_of_bars']
+        record['tracks'] = current_composition.inka_data_2['number_of_tracks']
+    except Exception as err:  # pylint: disable=broad-except
+        record['error'] = repr(err)
+    record['seconds'] = round(time.time() - start, 3)
+    return record
+
+
+def run_batch(entries, output_dir, num_of_processes):
+    """creates all compositions not yet in index file, using num_of_processes worker processes
+       (0 = no worker processes), returns number of created compositions"""
+    os.makedirs(output_dir, exist_ok=True)
+    finished = read_index(output_dir)
+
+    todo = []
+    num_of_invalid = 0
+    for web_settings, seed_val, instru_id_val in entries:
+        try:
+            selections = settings.parse_web_selections(web_settings)
+        except (IndexError, KeyError, TypeError) as err:  # unknown menu entry
+            print('composition', seed_val, instru_id_val, 'skipped, invalid selection:', repr(err))
+            num_of_invalid += 1
+            continue
+        key = cache.get_cache_key(selections, seed_val, instru_id_val)
+        file_name = str(seed_val) + '_' + str(instru_id_val) + '_' + key[:8] + '.mid'
+        if file_name not in finished:
+            finished.add(file_name)  # same composition twice in manifest
+            todo.append((selections, seed_val, instru_id_val, os.path.join(output_dir, file_name)))
+    print(len(entries) - len(todo) - num_of_invalid, 'of', len(entries), 'compositions already finished')
+
+    with open(os.path.join(output_dir, INDEX_FILE), 'a', encoding='utf-8') as index_file:
+
+        def add_to_index(count, record):
+            index_file.write(json.dumps(record) + '\n')
+            index_file.flush()
+            print('%6d/%d %s %8.2f s %s' % (count, len(todo), record['file'], record['seconds'],
+                                            record.get('error', '')))
+
+        if num_of_processes == 0:
+            for count, entry in enumerate(todo, 1):
+                add_to_index(count, compose_file(*entry))
+        else:
+            process_pool = jobs.ProcessPool(num_of_processes, initializer=webutilities.init_compose_process)
+            futures = [process_pool.submit(compose_file, *entry) for entry in todo]
+            for count, future in enumerate(concurrent.futures.as_completed(futures), 1):
+                add_to_index(count, future.result())
+            process_pool.shutdown()
+
+    return len(todo)
+
+
+def main(argv=None):
+    """batch mode main function, argv are the command line arguments after 'batch'"""
+    parser = argparse.ArgumentParser(prog='python -m inkamusic batch',
+                                     description='creates compositions without the web interface')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--seeds', help="seed range, e.g. '1000-1999'")
+    source.add_argument('--manifest', help='csv or jsonl file, one composition per row or line')
+    parser.add_argument('--instru-id', type=int, help='instrumentation id used for seed range (default: seed)')
+    for option, field, _ in MENU_OPTIONS:
+        parser.add_argument(option, help='menu selection used for ' + field)
+    parser.add_argument('--workers', type=int, default=os.cpu_count(),
+                        help='number of worker processes (default: number of cpu cores)')
+    parser.add_argument('--output', default='inkamusic_batch', help='output directory')
+    args = parser.parse_args(argv)
+
+    start = time.time()
+    num_of_compositions = run_batch(get_entries(args), args.output, args.workers)
+    print(num_of_compositions, 'compositions created in %.1f s' % (time.time() - start))
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,201 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+This file contains the composition cache.
+A composition is fully defined by seed, instrumentation ID and the selections of the web interface,
+so the midi data of a composition is stored using these values as key:
+in memory (least recently used entries are removed if the memory budget is exceeded)
+and in a directory on disk (least recently used files are removed if the disk budget is exceeded).
+
+"""
+
+import collections
+import hashlib
+import os
+import threading
+
+import inkamusic
+import inkamusic.const as const
+
+
+def get_cache_key(selections, seed_val, instru_id_val):
+    """returns the cache key (a hex string) of a composition"""
+    # the version is part of the key, a new version may create different compositions for the same values
+    key_data = repr((inkamusic.__version__, const.RNDM_COMPATIBILITY_MODE, tuple(selections), seed_val, instru_id_val))
+    return hashlib.sha256(key_data.encode('utf-8')).hexdigest()
+
+
+class MemoryCache():
+    """
+    Keeps midi data in memory, up to max_bytes in total.
+    If more data is added, the least recently used entries are removed.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key: midi data, least recently used first
+        self.num_of_bytes = 0
+
+    def get(self, key):
+        """returns midi data, None if key is not cached"""
+        data = self.entries.get(key)
+        if data is not None:
+            self.entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        """adds midi data, data larger than max_bytes is not added"""
+        if key in self.entries:
+            self.num_of_bytes -= len(self.entries.pop(key))
+        if len(data) > self.max_bytes:
+            return
+        self.entries[key] = data
+        self.num_of_bytes += len(data)
+        while self.num_of_bytes > self.max_bytes:
+            _, removed = self.entries.popitem(last=False)
+            self.num_of_bytes -= len(removed)
+
+
+class DiskCache():
+    """
+    Keeps midi files in directory, up to max_bytes in total.
+    If more files are added, the least recently used files are removed.
+    Files already in directory (from former runs) are used, the modification time of a file is its last use.
+    All functions may be called by several threads, files are read and written without holding the lock.
+    """
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.entries = collections.OrderedDict()  # key: file size, least recently used first
+        self.num_of_bytes = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(directory, exist_ok=True)
+        files = []
+        for file_name in os.listdir(directory):
+            if file_name.endswith(const.CACHE_FILE_EXT):
+                stat = os.stat(os.path.join(directory, file_name))
+                files.append((stat.st_mtime, file_name[:-len(const.CACHE_FILE_EXT)], stat.st_size))
+        for _, key, size in sorted(files):
+            self.entries[key] = size
+            self.num_of_bytes += size
+        with self.lock:
+            old_keys = self._remove_old_entries()
+        self._remove_files(old_keys)
+
+    def get_file_name(self, key):
+        """returns file name used for key"""
+        return os.path.join(self.directory, key + const.CACHE_FILE_EXT)
+
+    def get(self, key):
+        """returns midi data, None if key is not cached"""
+        with self.lock:
+            if key not in self.entries:
+                return None
+        file_name = self.get_file_name(key)
+        try:
+            with open(file_name, 'rb') as midi_file:
+                data = midi_file.read()
+            os.utime(file_name)
+        except OSError:  # removed by someone else
+            with self.lock:
+                if key in self.entries:
+                    self.num_of_bytes -= self.entries.pop(key)
+            return None
+        with self.lock:
+            if key in self.entries:
+                self.entries.move_to_end(key)
+        return data
+
+    def put(self, key, data):
+        """adds midi data, data larger than max_bytes is not added"""
+        with self.lock:
+            if key in self.entries or len(data) > self.max_bytes:
+                return
+        # write to a temporary file first (one for each thread), a partly written file must never be used
+        file_name = self.get_file_name(key)
+        tmp_file_name = file_name + '.' + str(threading.get_ident()) + '.tmp'
+        with open(tmp_file_name, 'wb') as midi_file:
+            midi_file.write(data)
+        os.replace(tmp_file_name, file_name)
+        with self.lock:
+            if key in self.entries:  # added by another thread in the meantime
+                return
+            self.entries[key] = len(data)
+            self.num_of_bytes += len(data)
+            old_keys = self._remove_old_entries()
+        self._remove_files(old_keys)
+
+    def _remove_old_entries(self):
+        """removes least recently used entries until max_bytes is not exceeded, returns their keys.
+           Called with lock held, the files are removed by _remove_files"""
+        old_keys = []
+        while self.num_of_bytes > self.max_bytes:
+            key, size = self.entries.popitem(last=False)
+            self.num_of_bytes -= size
+            old_keys.append(key)
+        return old_keys
+
+    def _remove_files(self, keys):
+        """removes the files of keys"""
+        for key in keys:
+            try:
+                os.remove(self.get_file_name(key))
+            except OSError:
+                pass
+
+    def get_status(self):
+        """returns number of entries and size of all files"""
+        with self.lock:
+            return len(self.entries), self.num_of_bytes
+
+
+class CompositionCache():
+    """
+    Two level cache for midi data of compositions, memory first, then disk.
+    Data found on disk is added to memory again.
+    All functions may be called by several threads. The lock is only held for the memory cache and the counters,
+    a slow disk does not delay memory hits of other threads.
+    """
+
+    def __init__(self, memory_bytes, directory, disk_bytes):
+        self.memory = MemoryCache(memory_bytes)
+        self.disk = DiskCache(directory, disk_bytes)
+        self.lock = threading.Lock()
+        self.counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0}
+
+    def get(self, key):
+        """returns midi data, None if key is not cached"""
+        with self.lock:
+            data = self.memory.get(key)
+            if data is not None:
+                self.counters['memory_hits'] += 1
+                return data
+        data = self.disk.get(key)
+        with self.lock:
+            if data is not None:
+                self.counters['disk_hits'] += 1
+                self.memory.put(key, data)
+                return data
+            self.counters['misses'] += 1
+            return None
+
+    def put(self, key, data):
+        """adds midi data to memory and disk"""
+        with self.lock:
+            self.memory.put(key, data)
+        self.disk.put(key, data)
+
+    def get_status(self):
+        """returns hit and miss counters and the size of both cache levels"""
+        with self.lock:
+            status = dict(self.counters)
+            status['memory_entries'] = len(self.memory.entries)
+            status['memory_bytes'] = self.memory.num_of_bytes
+        status['disk_entries'], status['disk_bytes'] = self.disk.get_status()
+        return status
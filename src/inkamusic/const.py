@@ -18,6 +18,7 @@ DEBUG_OUTPUT = False
 STAT_DIR = 'public'  # public = static dir of cherrypy web server
 MID_DIR = STAT_DIR+'/midi/'  # midi file sub directory
 LOG_DIR = STAT_DIR+'/logs/'  # cherrypy error log sub directory
+CACHE_DIR = MID_DIR+'cache/'  # composition cache sub directory
 
 HTTP_PORT = 8080
 HTTPS_PORT = 0  # 8443, 0 disables https support
@@ -25,11 +26,39 @@ HTTPS_KEY_FILE = 'privkey001.key'
 HTTPS_INTERMEDIATE_FILE = 'intermedi.cer'
 HTTPS_CERTIFICATE_FILE = 'inkaalgo.cer'
 
+# job queue of web interface
+# each composition uses its own settings, so compositions are created concurrently by all worker threads
+JOB_WORKERS = 2
+JOB_QUEUE_DEPTH = 20  # max number of waiting compositions, more requests are rejected (HTTP 429)
+JOB_MAX_FINISHED = 100  # number of finished compositions kept for download
+JOB_PROCESSES = 0  # worker processes creating compositions for the web server, 0 = one per cpu core
+
+# composition cache of web interface
+CACHE_MEMORY_BYTES = 32 * 1024 * 1024  # max size of all compositions kept in memory
+CACHE_DISK_BYTES = 512 * 1024 * 1024  # max size of all composition files in CACHE_DIR
+CACHE_FILE_EXT = '.mid'
+
+METRICS_ENABLED = True  # collect durations of the composition stages etc., served by the metrics page
+
+# profiling of single compositions, see module profiling
+PROFILE_REQUESTS = False  # True: compositions requested with parameter profile (generate?...&profile=1) are profiled
+PROFILE_SAMPLE_PERCENT = 0  # percentage of all compositions which are profiled
+PROFILE_DIR = 'profiles/'  # not in STAT_DIR, profiling files are not served by the web server
+
 TICKSRES = 720  # MIDI resolution
 
 # random classes
 NUM_RNDM_CLASSES = 11
 
+# True: random classes return the same values as older versions, so existing seed and
+# instrumentation ID values reproduce the same compositions.
+# False: faster random functions are used, the same seeds will create different compositions
+RNDM_COMPATIBILITY_MODE = True
+
+# True: all candidate tones of a melody tone are evaluated in one pass (utilities.check_tones)
+# False: each candidate tone is evaluated separately (utilities.check_tone), both give the same results
+BATCH_TONE_SCORING = True
+
 # max seed value allowed (used for seed and instrumentation ID)
 MAX_SEED = 99999999
 
@@ -119,8 +148,6 @@ SCALE_COUNT_INDX = 1
 SCALE_START_INDX = 2
 SCALE_NOTE_INDX = 3
 SCALE_HARMONY_TYPES_INDX = 4
-ORIGINAL_BAR_NUM_INDX = 3
-CREATE_TYPE_INDX = 4
 
 # track_info indices
 TRACK_INFO_MELO_OR_PERC_INDX = 0
@@ -129,17 +156,6 @@ TRACK_INFO_INSTRU_PAUSE_INDX = 2
 TRACK_INFO_RHYTHM_INDX = 3
 TRACK_INFO_CONNECT_INDX = 4
 
-# constants for bar_statistics columns
-USED_HOW_OFTEN = 0  # how often is the bar used within the composition
-GROUP_IDENTIFIER = 1  # global number of bar starting a group of bars
-CREATE_TYPE_IDENTIFIER = 2  # create type of bar
-HARMONY_IDENTIFIER = 3  # harmony type of bar
-
-""" track number + PLAYED_IN_TRACK gives column index of column which defines if a specific bar is actually
-   played or paused in a track """
-
-PLAYED_IN_TRACK = 4
-
 # constants for rhythm creation
 ACC_UNDEFINED = -999
 RY_POS = 0
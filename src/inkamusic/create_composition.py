@@ -7,7 +7,9 @@ Copyright (C) 2019  Udo Wollschläger
 
 """
 # pylint  --rcfile = rcudo file
+import bisect
 import os
+import time
 import cherrypy
 
 import inkamusic.const as const
@@ -23,22 +25,60 @@ import inkamusic.midiutil as midiutil
 import inkamusic.rhythm_algorithms as rhythm_algorithms
 
 
-def find_first_dissonance(pos, pos_current_tone, tones, current_tone):
-    """finds first dissonance for current track"""
-    position = 0
-    dissonance_delta = -1
-    while position < len(pos):
-        if pos[position] > pos_current_tone:
-            for z_1 in current_tone:
-                for z_2 in tones[position]:
-                    if (z_1 - z_2) % 12 in [1, 11]:  # dissonance
-                        dissonance_delta = pos[position] - pos_current_tone
+class PitchClassTimeline():
+    """
+    Tone positions of one composed track together with a 12 bit pitch class mask for each position.
+    For each pitch class the index of the next position containing it is stored, so the first
+    dissonant tone after a given position is found by a binary search and a few table lookups.
+    """
 
-        if dissonance_delta != -1:
-            break
-        else:
-            position += 1
-    return dissonance_delta
+    def __init__(self, pos, tones):
+        self.pos = pos
+        self.masks = []
+        for tone in tones:
+            mask = 0
+            for z_2 in tone:
+                mask |= 1 << (z_2 % 12)
+            self.masks.append(mask)
+
+        # humanized positions are normally ascending, otherwise the entries are searched one by one
+        self.is_sorted = all(pos[i] <= pos[i + 1] for i in range(len(pos) - 1))
+        self.next_indx = []
+        if self.is_sorted:
+            num_of_pos = len(pos)
+            for pitch_class in range(12):
+                next_indx = [num_of_pos] * (num_of_pos + 1)
+                bit = 1 << pitch_class
+                for position in range(num_of_pos - 1, -1, -1):
+                    next_indx[position] = position if self.masks[position] & bit else next_indx[position + 1]
+                self.next_indx.append(next_indx)
+
+    def find_first_dissonance(self, pos_current_tone, current_tone):
+        """
+        returns distance from pos_current_tone to the first tone with a greater position which is
+        dissonant (one half tone apart) to current_tone, -1 if there is none
+        """
+        dissonant_classes = set()
+        for z_1 in current_tone:
+            dissonant_classes.add((z_1 + 1) % 12)
+            dissonant_classes.add((z_1 - 1) % 12)
+        if not dissonant_classes:
+            return -1
+
+        if self.is_sorted:
+            start = bisect.bisect_right(self.pos, pos_current_tone)
+            position = min(self.next_indx[pitch_class][start] for pitch_class in dissonant_classes)
+            if position == len(self.pos):
+                return -1
+            return self.pos[position] - pos_current_tone
+
+        dissonant_mask = 0
+        for pitch_class in dissonant_classes:
+            dissonant_mask |= 1 << pitch_class
+        for position, pos in enumerate(self.pos):
+            if pos > pos_current_tone and self.masks[position] & dissonant_mask:
+                return pos - pos_current_tone
+        return -1
 
 
 def set_midi_on_off(t_chord, midi_params, c_3):
@@ -48,7 +88,7 @@ def set_midi_on_off(t_chord, midi_params, c_3):
     delta_shift = 0
     for indx, tone in enumerate(t_chord):
 
-        in1 = int((c_3['intensities'][midi_params['index']] * (100 - intensity_reduce)) / 100 + 0.5)
+        in1 = int((c_3['composed_track'].intensities[midi_params['index']] * (100 - intensity_reduce)) / 100 + 0.5)
 
         if indx == 0:
             midiutil.note_on_event(midi_params['current_track'],
@@ -92,18 +132,31 @@ class InkaAlgorithmicMusic():
                             'composition_struct': [],
                             'bar_struct': -1,
                             'bar_distribution': -1,
+                            'pitch_class_timelines': [],  # will contain a PitchClassTimeline for each melody track
+                            'try_counts': {},  # number of tries of retry loops, e.g. global_rhythm
+                            'num_of_notes': -1,
                             }
         self.inka_data_3 = {'harmony_class': harmonies.HarmonyBasics(self.inka_data_2['basic_scales']),
                             'current_track_midi_id': [],
                             'num_composed_bars': -1,
-                            'tones': [],
-                            'positions': [],
-                            'intensities': [],
-                            'connection_types': [],
+                            'composed_track': None,  # utilities.ComposedTrack of current track
                             'staccato_length_in_ticks': -1,
                             'min_tone_separation_in_ticks': -1,
                             }
 
+    def report_progress(self, value):
+        """reports progress (0 ... 1) of the composition, if a progress function was given"""
+        if self.inka_data.get('progress') is not None:
+            self.inka_data['progress'](value)
+
+    def report_stage(self, stage, start):
+        """reports the seconds used for a stage of the composition (since start), if a stage_time function
+           was given, returns the current time as start of the next stage"""
+        now = time.perf_counter()
+        if self.inka_data.get('stage_time') is not None:
+            self.inka_data['stage_time'](stage, now - start)
+        return now
+
     def calc_num_of_bars(self):
         """calculates number of bars"""
         c_2 = self.inka_data_2
@@ -216,17 +269,12 @@ class InkaAlgorithmicMusic():
 
         min_dissonance_delta = -1  # not yet set
 
-        for track in range(len(c_2['track_info'])):
-            track_midi_id = tu.get_instrument_midi(c_2['track_info'][track])
-            perc = (track_midi_id[1] < 0)
-
-            if not perc and track != current_track_id:
+        for track, timeline in enumerate(c_2['pitch_class_timelines']):
 
-                tones = c_2['composed_track'][track].gettones()
-                pos = c_2['composed_track'][track].getpositions()
+            if timeline is not None and track != current_track_id:
 
                 # find pos of first tone with pos > pos_current_tone which is dissonant to current_tone
-                dissonance_delta = find_first_dissonance(pos, pos_current_tone, tones, current_tone)
+                dissonance_delta = timeline.find_first_dissonance(pos_current_tone, current_tone)
                 if dissonance_delta != -1:
                     if min_dissonance_delta == -1 or dissonance_delta < min_dissonance_delta:
                         min_dissonance_delta = dissonance_delta
@@ -243,20 +291,22 @@ class InkaAlgorithmicMusic():
         avoiding dissonances or tones too short or pauses"""
         c_3 = self.inka_data_3
 
-        pos_current_tone = c_3['positions'][indx]
-        if len(c_3['tones']) - 1 == indx:  # last tone
+        positions = c_3['composed_track'].positions
+        pos_current_tone = positions[indx]
+        if len(positions) - 1 == indx:  # last tone
             pos_next_tone = pos_current_tone + (mp.LAST_TONE_LENGTH * const.TICKSRES * self.inka_data_2['bpm']) // 60
         else:
-            pos_next_tone = c_3['positions'][indx + 1]
+            pos_next_tone = positions[indx + 1]
 
-        connection_type = c_3['connection_types'][indx]
+        connection_type = c_3['composed_track'].connection_types[indx]
         if connection_type == const.CONNECT_AUTODAMP:
             auto_damp_time_in_ticks = (mp.AUTO_DAMP_TIME * const.TICKSRES * self.inka_data_2['bpm']) // 60
 
         if is_percussion:
             dissonance_limit = pos_next_tone  # no dissonance for percussion instruments
         else:
-            delta_to_first_dissonant_tone = self.find_dissonance_delta(track_id, pos_current_tone, c_3['tones'][indx])
+            delta_to_first_dissonant_tone = self.find_dissonance_delta(track_id, pos_current_tone,
+                                                                       c_3['composed_track'].get_tones(indx))
 
             # if distance to next dissonant tone is greater than auto_damp_time_in_ticks,
             # enlarge delta_to_first_dissonant_tone even more
@@ -307,12 +357,13 @@ class InkaAlgorithmicMusic():
                        'exact_midi_tone_length': exact_midi_tone_length,
                        }
 
-        for t_chord in c_3['tones']:
+        positions = c_3['composed_track'].positions
+        for t_chord in c_3['composed_track'].iter_tones():
 
             if index == 0:
-                ticks = c_3['positions'][index]
+                ticks = positions[index]
             else:
-                ticks = c_3['positions'][index] - c_3['positions'][index - 1] - exact_midi_tone_length
+                ticks = positions[index] - positions[index - 1] - exact_midi_tone_length
 
             exact_midi_tone_length = self.get_tone_length_and_connection_type(index, track_id, is_percussion=False)
 
@@ -358,14 +409,15 @@ class InkaAlgorithmicMusic():
 
         exact_midi_tone_length = -1  # not set yet
 
-        for index, _ in enumerate(c_3['tones']):
+        positions = c_3['composed_track'].positions
+        for index in range(len(c_3['composed_track'])):
 
             if index == 0:
-                ticks = c_3['positions'][index]
+                ticks = positions[index]
             else:
-                ticks = c_3['positions'][index] - c_3['positions'][index - 1] - exact_midi_tone_length
+                ticks = positions[index] - positions[index - 1] - exact_midi_tone_length
 
-            velocity = int(c_3['intensities'][index] + 0.5)
+            velocity = int(c_3['composed_track'].intensities[index] + 0.5)
 
             midiutil.note_on_event(current_track, tick=ticks, channel=9, pitch=perc_instrument_type, velocity=velocity)
 
@@ -377,8 +429,8 @@ class InkaAlgorithmicMusic():
 
     # end create_percussion_midi
 
-    def create_midi(self):
-        """creates midi data for all tracks"""
+    def create_midi_pattern(self):
+        """creates midi data for all tracks, returns a list with one midiutil.MidiTrackBuffer per track"""
 
         c_2 = self.inka_data_2
         c_3 = self.inka_data_3
@@ -387,9 +439,19 @@ class InkaAlgorithmicMusic():
 
         current_channel = 0
 
+        # pitch class timelines of all melody tracks, used to find dissonances between tracks
+        c_2['pitch_class_timelines'] = []
+        for track_id in range(len(c_2['track_info'])):
+            if tu.get_instrument_midi(c_2['track_info'][track_id])[1] >= 0:  # melody instrument
+                c_2['pitch_class_timelines'].append(
+                    PitchClassTimeline(c_2['composed_track'][track_id].get_composed_track().positions,
+                                       c_2['composed_track'][track_id].get_composed_track().iter_tones()))
+            else:
+                c_2['pitch_class_timelines'].append(None)
+
         for track_id in range(len(c_2['track_info'])):
 
-            current_track = []
+            current_track = midiutil.MidiTrackBuffer()
 
             c_3['current_track_midi_id'] = tu.get_instrument_midi(c_2['track_info'][track_id])
             if c_3['current_track_midi_id'][1] >= 0:  # melody instrument
@@ -402,10 +464,7 @@ class InkaAlgorithmicMusic():
 
             midi_pattern.append(current_track)
 
-            c_3['tones'] = c_2['composed_track'][track_id].gettones()
-            c_3['positions'] = c_2['composed_track'][track_id].getpositions()
-            c_3['intensities'] = c_2['composed_track'][track_id].getintensities()
-            c_3['connection_types'] = c_2['composed_track'][track_id].getconnection_types()
+            c_3['composed_track'] = c_2['composed_track'][track_id].get_composed_track()
 
             midiutil.set_tempo_event(current_track, bpm=c_2['bpm'])
             midiutil.time_signature_event(current_track, numerator=c_2['num_of_beats'], denominator=4)
@@ -437,10 +496,23 @@ class InkaAlgorithmicMusic():
 
             midiutil.end_of_track_event(current_track)
 
-        package_dir = os.path.dirname(const.__file__) + "/"
-        midifilename = package_dir + const.MID_DIR + self.inka_data['random_file_name'] + '.mid'
+        return midi_pattern
 
-        midiutil.write_midifile(midifilename, midi_pattern)
+    # end create_midi_pattern
+
+    def create_midi(self, midi_stream=None):
+        """creates midi data for all tracks and writes it to midi_stream (any binary stream),
+           or to the midi file sub directory if midi_stream is None"""
+
+        midi_pattern = self.create_midi_pattern()
+        self.inka_data_2['num_of_notes'] = sum(track.status.count(0x90) for track in midi_pattern)  # note on events
+
+        if midi_stream is None:
+            package_dir = os.path.dirname(const.__file__) + "/"
+            midifilename = package_dir + const.MID_DIR + self.inka_data['random_file_name'] + '.mid'
+            midiutil.write_midifile(midifilename, midi_pattern)
+        else:
+            midiutil.write_midi(midi_stream, midi_pattern)
 
     # end create_midi
 
@@ -484,8 +556,10 @@ class InkaAlgorithmicMusic():
                                                             c_2['selected_speed'],
                                                             c_2['global_rhythm'])
 
-    def create_composition(self):
-        """ This function generates a composition """
+    def create_composition(self, midi_stream=None):
+        """ This function generates a composition
+            The midi data is written to midi_stream (any binary stream, e.g. io.BytesIO),
+            or to the midi file sub directory if midi_stream is None """
 
         c_2 = self.inka_data_2
         c_3 = self.inka_data_3
@@ -522,18 +596,22 @@ class InkaAlgorithmicMusic():
                                                                              c_2['num_of_bars'])
 
         # create a global rhythm for the composition, based on the selected rhythm
+        start = time.perf_counter()
         speed = self.inka_data['menu_options'].get_selected_speed()  # speed[1] is MIN_SPLIT_LENGTH
         c_2['global_rhythm'], c_2['selected_rhythm'] = \
             rhythm_algorithms.create_global_rhythm(self.inka_data['menu_options'].get_selected_rhythm_definition(),
                                                    c_2['num_of_beats'],
                                                    speed[1],
-                                                   self.inka_data['rndm_2'])
+                                                   self.inka_data['rndm_2'],
+                                                   try_counts=c_2['try_counts'])
+        start = self.report_stage('global_rhythm', start)
 
         # prepare all tracks of the composition, based on instruments and rhythm selected
         c_2['number_of_tracks'] = tu.prepare_track_info(c_2['track_info'],
                                                         self.inka_data['menu_options'],
                                                         c_2['selected_rhythm'],
                                                         self.inka_data['rndm_2'])
+        start = self.report_stage('prepare_track_info', start)
 
         # now create the main structure of the composition, as a hierarchical object
         composition_struct_object = structures.CompositionStructure(num_of_bars=c_2['num_of_bars'],
@@ -550,6 +628,7 @@ class InkaAlgorithmicMusic():
 
         # for debugging purposes
         # composition_struct_object.show_bar_struct()
+        start = self.report_stage('composition_structure', start)
 
         # calculate how often a specific bar is used within the composition
         # The data structure bar_distribution will later contain additional information about
@@ -561,6 +640,7 @@ class InkaAlgorithmicMusic():
 
         bar_distribution_object.set_bar_harmony_type()
         bar_distribution_object.set_paused_bars()
+        start = self.report_stage('bar_distribution', start)
 
         # create track rhythms for all non-percussion tracks
 
@@ -572,12 +652,17 @@ class InkaAlgorithmicMusic():
                 tu.set_track_rhythm(track, tr_rhythm)
 
         tu.show_track_info(c_2['track_info'])
+        start = self.report_stage('track_rhythms', start)
 
         # create a harmony track first, used by all other instrument tracks
         self.create_track(const.HARMONY_TRACK)
+        start = self.report_stage('harmony_track', start)
 
         # now create all instrument tracks
         for track in range(len(c_2['track_info'])):
+            self.report_progress((track + 1) / (len(c_2['track_info']) + 1))
             self.create_track(track)
+            start = self.report_stage('track_' + str(track), start)
 
-        self.create_midi()
+        self.create_midi(midi_stream)
+        self.report_stage('create_midi', start)
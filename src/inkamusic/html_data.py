@@ -70,16 +70,41 @@ def get_html_source(html_id):
                         string=string_seed.substring(0,23);
                         seed=string_seed.substring(23,32);
                         instru_id=string_seed.substring(32);
-                        var aid = document.getElementById("spinny");
-                        aid.src="/static/empty.gif" ;
                         var aid = document.getElementById("seedvalue");
                         aid.value=parseInt(seed);
                         var aid = document.getElementById("instru_idvalue");
                         aid.value=parseInt(instru_id);
-                        var aid = document.getElementById("downloadbutton");
-                        aid.href="/static/midi/"+string+".mid";
-                        aid.download=string+".mid"
-                        aid.hidden=false;
+                        // the composition is created by the job queue, ask for its state until it is finished
+                        var poll = function() {
+                            $.getJSON("/status", {"job_id": string})
+                            .done(function(status) {
+                                if (status.state == "done") {
+                                    var aid = document.getElementById("spinny");
+                                    aid.src="/static/empty.gif" ;
+                                    var aid = document.getElementById("downloadbutton");
+                                    aid.href="/result?job_id="+string;
+                                    aid.download=string+".mid"
+                                    aid.hidden=false;
+                                } else if (status.state == "failed") {
+                                    var aid = document.getElementById("spinny");
+                                    aid.src="/static/empty.gif" ;
+                                } else {
+                                    setTimeout(poll, 1000);
+                                }
+                            })
+                            .fail(function() {
+                                var aid = document.getElementById("spinny");
+                                aid.src="/static/empty.gif" ;
+                            });
+                        };
+                        poll();
+                    })
+                    .fail(function(xhr) {
+                        var aid = document.getElementById("spinny");
+                        aid.src="/static/empty.gif" ;
+                        if (xhr.status == 429) {
+                            alert("Too many compositions are waiting, please try again later.");
+                        }
                     });
                     e.preventDefault();
                 });
@@ -0,0 +1,197 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+This file contains the job queue used to create compositions outside of the web server request threads
+and the process pool used to create compositions on all cpu cores
+
+"""
+
+import concurrent.futures
+import multiprocessing
+import os
+import queue
+import threading
+import time
+
+import cherrypy
+
+JOB_QUEUED = 'queued'
+JOB_RUNNING = 'running'
+JOB_DONE = 'done'
+JOB_FAILED = 'failed'
+
+
+class JobQueue():
+    """
+    Runs jobs (function calls) in a pool of worker threads.
+    The number of waiting jobs is limited to max_queue_depth, submit raises queue.Full if the queue is full.
+    Results of finished jobs are kept until more than max_finished_jobs jobs are finished.
+    """
+
+    def __init__(self, num_of_workers, max_queue_depth, max_finished_jobs):
+        self.queue = queue.Queue(maxsize=max_queue_depth)
+        self.max_finished_jobs = max_finished_jobs
+        self.jobs = {}  # job id: job data, in order of submission
+        self.lock = threading.Lock()
+        self.workers = []
+        for _ in range(num_of_workers):
+            worker = threading.Thread(target=self._work, daemon=True)
+            worker.start()
+            self.workers.append(worker)
+
+    def submit(self, job_id, function, *args):
+        """
+        adds a job, function(*args, progress=callback) is called by a worker thread, callback(value)
+        may be used by function to report its progress (0 ... 1)
+        """
+        with self.lock:
+            assert job_id not in self.jobs, "job id is already used " + repr(job_id)
+            self.jobs[job_id] = {'state': JOB_QUEUED,
+                                 'progress': 0,
+                                 'result': None,
+                                 'error': None,
+                                 'submitted': time.time(),
+                                 'started': None,
+                                 'finished': None,
+                                 'event': threading.Event(),
+                                 }
+            try:
+                self.queue.put_nowait((job_id, function, args))
+            except queue.Full:
+                del self.jobs[job_id]
+                raise
+
+    def add_finished(self, job_id, result):
+        """adds a job which is already done, e.g. if result was found in a cache"""
+        with self.lock:
+            assert job_id not in self.jobs, "job id is already used " + repr(job_id)
+            now = time.time()
+            self.jobs[job_id] = {'state': JOB_DONE,
+                                 'progress': 1,
+                                 'result': result,
+                                 'error': None,
+                                 'submitted': now,
+                                 'started': now,
+                                 'finished': now,
+                                 'event': threading.Event(),
+                                 }
+            self.jobs[job_id]['event'].set()
+        self._remove_old_jobs()
+
+    def _work(self):
+        """worker thread, runs jobs until the program ends"""
+        while True:
+            job_id, function, args = self.queue.get()
+            with self.lock:
+                job = self.jobs[job_id]
+                job['started'] = time.time()
+                job['state'] = JOB_RUNNING
+
+            def set_progress(value, job=job):
+                job['progress'] = value
+
+            try:
+                result = function(*args, progress=set_progress)
+                error = None
+            except Exception as err:  # pylint: disable=broad-except
+                # the exception does not reach the web server, so it is logged here
+                cherrypy.log('job ' + repr(job_id) + ' failed', context='JOBS', traceback=True)
+                error = repr(err)
+            with self.lock:
+                if error is None:
+                    job['result'] = result
+                    job['progress'] = 1
+                    job['state'] = JOB_DONE
+                else:
+                    job['error'] = error
+                    job['state'] = JOB_FAILED
+                job['finished'] = time.time()
+            job['event'].set()
+            self.queue.task_done()
+            self._remove_old_jobs()
+
+    def _remove_old_jobs(self):
+        """removes the oldest finished jobs, if there are more than max_finished_jobs"""
+        with self.lock:
+            finished = [job_id for job_id, job in self.jobs.items() if job['state'] in [JOB_DONE, JOB_FAILED]]
+            for job_id in finished[:max(0, len(finished) - self.max_finished_jobs)]:
+                del self.jobs[job_id]
+
+    def get_queue_depth(self):
+        """returns number of jobs waiting for a worker"""
+        return self.queue.qsize()
+
+    def get_status(self, job_id):
+        """returns state, progress, position in queue (0 = next job) and error of a job, None if job is unknown"""
+        with self.lock:
+            if job_id not in self.jobs:
+                return None
+            job = self.jobs[job_id]
+            position = 0
+            if job['state'] == JOB_QUEUED:
+                for other_id, other_job in self.jobs.items():
+                    if other_id == job_id:
+                        break
+                    if other_job['state'] == JOB_QUEUED:
+                        position += 1
+            status = {'state': job['state'],
+                      'progress': job['progress'],
+                      'position': position,
+                      'error': job['error'],
+                      }
+            if job['finished'] is not None:
+                status['seconds'] = job['finished'] - job['started']
+            return status
+
+    def get_result(self, job_id):
+        """returns result of a finished job, None if job is unknown or not finished"""
+        with self.lock:
+            if job_id not in self.jobs or self.jobs[job_id]['state'] != JOB_DONE:
+                return None
+            return self.jobs[job_id]['result']
+
+    def wait(self, job_id, timeout=None):
+        """waits until a job is finished, returns False if timeout (seconds) expired"""
+        with self.lock:
+            if job_id not in self.jobs:
+                return True
+            event = self.jobs[job_id]['event']
+        return event.wait(timeout)
+
+
+class ProcessPool():
+    """
+    Runs function calls in a pool of worker processes, all processes are started (and initializer is called
+    in each process) when the pool is created, not when the first job arrives.
+    Processes are started with the spawn method, forking a multi-threaded web server is not safe.
+    Functions, arguments and results must be picklable, functions must be defined at module level.
+    """
+
+    def __init__(self, num_of_processes, initializer=None):
+        self.num_of_processes = num_of_processes
+        self.executor = concurrent.futures.ProcessPoolExecutor(max_workers=num_of_processes,
+                                                               mp_context=multiprocessing.get_context('spawn'),
+                                                               initializer=initializer)
+        self.warm_up()
+
+    def warm_up(self):
+        """starts all worker processes and waits until they are ready"""
+        # each submit starts a new process as long as no process is idle
+        futures = [self.executor.submit(os.getpid) for _ in range(self.num_of_processes)]
+        concurrent.futures.wait(futures)
+
+    def submit(self, function, *args):
+        """calls function(*args) in a worker process, returns a concurrent.futures.Future"""
+        return self.executor.submit(function, *args)
+
+    def run(self, function, *args):
+        """calls function(*args) in a worker process, waits for and returns the result"""
+        return self.submit(function, *args).result()
+
+    def shutdown(self):
+        """stops all worker processes"""
+        self.executor.shutdown()
@@ -0,0 +1,120 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+This file contains the metrics of the web interface (durations of the composition stages, tries of
+retry loops, number of notes, size of midi data, ...), aggregated as histograms and counters
+and returned in the Prometheus text format
+
+"""
+
+import bisect
+import threading
+
+SECONDS_BUCKETS = [0.001, 0.005, 0.01, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60]
+TRIES_BUCKETS = [1, 2, 3, 5, 10, 20, 50, 100, 1000]
+NOTES_BUCKETS = [100, 1000, 2500, 5000, 10000, 25000, 50000, 100000]
+BYTES_BUCKETS = [1000, 10000, 50000, 100000, 250000, 500000, 1000000]
+
+# name: (type, help text, buckets of histogram)
+METRICS = {'inkamusic_composition_seconds': ('histogram', 'Time used to create a composition', SECONDS_BUCKETS),
+           'inkamusic_stage_seconds': ('histogram', 'Time used for a stage of create_composition', SECONDS_BUCKETS),
+           'inkamusic_tries': ('histogram', 'Number of tries of a retry loop', TRIES_BUCKETS),
+           'inkamusic_notes': ('histogram', 'Number of notes of a composition', NOTES_BUCKETS),
+           'inkamusic_midi_bytes': ('histogram', 'Size of the midi data of a composition', BYTES_BUCKETS),
+           'inkamusic_compositions_total': ('counter', 'Number of finished compositions', None),
+           'inkamusic_cache_requests_total': ('counter', 'Number of composition cache requests', None),
+           'inkamusic_job_queue_depth': ('gauge', 'Number of compositions waiting for a worker', None),
+           }
+
+
+class Histogram():
+    """cumulative histogram as used by Prometheus"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last count is +Inf
+        self.sum = 0
+
+    def observe(self, value):
+        """adds value to histogram"""
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def get_lines(self, name, labels):
+        """returns histogram in Prometheus text format"""
+        lines = []
+        count = 0
+        for bucket, bucket_count in zip(self.buckets + ['+Inf'], self.counts):
+            count += bucket_count
+            lines.append(name + '_bucket' + format_labels(labels + (('le', str(bucket)),)) + ' ' + str(count))
+        lines.append(name + '_sum' + format_labels(labels) + ' ' + repr(self.sum))
+        lines.append(name + '_count' + format_labels(labels) + ' ' + str(count))
+        return lines
+
+
+def format_labels(labels):
+    """returns labels ((name, value), ...) in Prometheus text format"""
+    if not labels:
+        return ''
+    return '{' + ','.join(name + '="' + value + '"' for name, value in labels) + '}'
+
+
+class Metrics():
+    """
+    Collects histograms, counters and gauges, all functions may be called by several threads.
+    Labels are passed as keyword arguments, e.g. observe('inkamusic_stage_seconds', 0.1, stage='create_midi')
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.values = {}  # (name, labels): Histogram or number
+
+    def observe(self, name, value, **labels):
+        """adds value to histogram"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            if key not in self.values:
+                self.values[key] = Histogram(METRICS[name][2])
+            self.values[key].observe(value)
+
+    def increment(self, name, value=1, **labels):
+        """increments counter"""
+        key = (name, tuple(sorted(labels.items())))
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + value
+
+    def set(self, name, value, **labels):
+        """sets gauge (or counter maintained elsewhere)"""
+        with self.lock:
+            self.values[(name, tuple(sorted(labels.items())))] = value
+
+    def observe_composition(self, stats):
+        """adds the statistics of one composition (see webutilities.compose_midi)"""
+        self.observe('inkamusic_composition_seconds', stats['seconds'])
+        for stage, seconds in stats['stages'].items():
+            self.observe('inkamusic_stage_seconds', seconds, stage=stage)
+        for loop, tries in stats['try_counts'].items():
+            self.observe('inkamusic_tries', tries, loop=loop)
+        self.observe('inkamusic_notes', stats['notes'])
+        self.observe('inkamusic_midi_bytes', stats['bytes'])
+
+    def get_text(self):
+        """returns all metrics in Prometheus text format"""
+        lines = []
+        with self.lock:
+            for name, (metric_type, help_text, _) in METRICS.items():
+                keys = sorted(key for key in self.values if key[0] == name)
+                if not keys:
+                    continue
+                lines.append('# HELP ' + name + ' ' + help_text)
+                lines.append('# TYPE ' + name + ' ' + metric_type)
+                for key in keys:
+                    if metric_type == 'histogram':
+                        lines += self.values[key].get_lines(name, key[1])
+                    else:
+                        lines.append(name + format_labels(key[1]) + ' ' + repr(self.values[key]))
+        return '\n'.join(lines) + '\n'
@@ -9,10 +9,13 @@ This file contains MIDI file functions
 
 """
 
+import io
 import math
+from array import array
 from struct import pack
 import inkamusic.const as const
 
+# layout of an event as list, as returned by MidiTrackBuffer.events()
 STATUSMSG_INDX = 0
 LEN_INDX = 1
 TICK_INDX = 2
@@ -21,48 +24,107 @@ META_COMMAND = 4
 DATA_INDX = 5
 
 
+class MidiTrackBuffer():
+    """
+    Holds the events of one MIDI track in one array per event property instead of one list per event.
+    Data bytes of channel events (note on, note off, ...) are held in data_1 and data_2,
+    data bytes of meta and sysex events are appended to payload, offset is the index of the first one.
+    """
+
+    def __init__(self):
+        self.status = array('B')
+        self.channel = array('B')
+        self.meta = array('B')
+        self.length = array('B')
+        self.tick = array('l')
+        self.data_1 = array('B')
+        self.data_2 = array('B')
+        self.offset = array('L')
+        self.payload = bytearray()
+
+    def __len__(self):
+        return len(self.status)
+
+    def add_channel_event(self, status, tick, channel, data_1, data_2=None):
+        """appends a channel event with one or two (data_2 not None) data bytes"""
+        self.status.append(status)
+        self.channel.append(channel)
+        self.meta.append(0)
+        self.tick.append(tick)
+        self.data_1.append(data_1)
+        if data_2 is None:
+            self.length.append(1)
+            self.data_2.append(0)
+        else:
+            self.length.append(2)
+            self.data_2.append(data_2)
+        self.offset.append(0)
+
+    def add_meta_event(self, status, tick, meta, data):
+        """appends a meta event (status 0xFF) or sysex event (status 0xF0)"""
+        self.status.append(status)
+        self.channel.append(0)
+        self.meta.append(meta)
+        self.length.append(len(data))
+        self.tick.append(tick)
+        self.data_1.append(0)
+        self.data_2.append(0)
+        self.offset.append(len(self.payload))
+        self.payload.extend(data)
+
+    def events(self):
+        """yields all events as lists (STATUSMSG_INDX, LEN_INDX, ...) for debugging purposes"""
+        for indx, status in enumerate(self.status):
+            event = [status, self.length[indx], self.tick[indx], self.channel[indx], self.meta[indx]]
+            if status in [0xFF, 0xF0]:
+                event.extend(self.payload[self.offset[indx]:self.offset[indx] + self.length[indx]])
+            else:
+                event.extend([self.data_1[indx], self.data_2[indx]][:self.length[indx]])
+            yield event
+
+
 def end_of_track_event(current_track):
     """appends an end of track event"""
-    current_track.append([0xFF, 0, 1, 0, 0x2F])
+    current_track.add_meta_event(0xFF, tick=1, meta=0x2F, data=[])
 
 
 def program_change_event(current_track, channel, data):
     """appends a program change of track event"""
 
-    current_track.append([0xC0, 1, 0, channel, 0, data])
+    current_track.add_channel_event(0xC0, 0, channel, data)
 
 
 def note_on_event(current_track, tick, channel, pitch, velocity):
     """appends a note on event"""
 
-    current_track.append([0x90, 2, tick, channel, 0, pitch, velocity])
+    current_track.add_channel_event(0x90, tick, channel, pitch, velocity)
 
 
 def note_off_event(current_track, tick, channel, pitch):
     """appends a note off event"""
-    current_track.append([0x80, 2, tick, channel, 0, pitch, 0])
+    current_track.add_channel_event(0x80, tick, channel, pitch, 0)
 
 
 def control_change_event(current_track, channel, control, value):
     """appends a control change event"""
-    current_track.append([0xB0, 2, 0, channel, 0, control, value])
+    current_track.add_channel_event(0xB0, 0, channel, control, value)
 
 
 def sys_ex_message_gm2(current_track):
     """appends a sys_ex message"""
-    current_track.append([0xF0, 4, 0, 0, 0, 126, 127, 9, 3])
+    current_track.add_meta_event(0xF0, tick=0, meta=0, data=[126, 127, 9, 3])
 
 
 def set_tempo_event(current_track, bpm):
     """appends a tempo event"""
     val = int(float(6e7) / bpm)
     data = [(val >> (16 - (8 * x)) & 0xFF) for x in range(3)]
-    current_track.append([0xFF, 3, 0, 0, 0x51, data[0], data[1], data[2]])
+    current_track.add_meta_event(0xFF, tick=0, meta=0x51, data=data)
 
 
 def time_signature_event(current_track, numerator, denominator):
     """appends a time signature event"""
-    current_track.append([0xFF, 4, 0, 0, 0x58, numerator, int(math.log(denominator, 2)), 0, 0])
+    current_track.add_meta_event(0xFF, tick=0, meta=0x58, data=[numerator, int(math.log(denominator, 2)), 0, 0])
 
 
 def encode_track_header(trklen):
@@ -70,45 +132,48 @@ def encode_track_header(trklen):
     return bytes('MTrk', 'UTF-8') + pack(">L", trklen)
 
 
-def encode_midi_event(event, running_status):
-    """encodes a midi event"""
-    ret = bytes()
-    ret += write_varlen(event[TICK_INDX])
-
-    data = []
-    if event[LEN_INDX] > 0:
-        for i in range(event[LEN_INDX]):
-            data.append(event[DATA_INDX + i])
-
-    if event[STATUSMSG_INDX] in [0xFF]:  # meta events
-        ret += bytes([event[STATUSMSG_INDX], event[META_COMMAND]])
-        ret += write_varlen(event[LEN_INDX])
-        ret += bytes(data)
-    elif event[STATUSMSG_INDX] in [0xF0]:  # Sysex events
-        ret += bytes([0xF0])
-        ret += write_varlen(event[LEN_INDX] + 1)
-        ret += bytes(data)
-        ret += bytes([0xF7])
-    else:
-        if not running_status or running_status[STATUSMSG_INDX] != event[STATUSMSG_INDX] or \
-          running_status[CHANNEL_INDX] != event[CHANNEL_INDX]:
-            running_status = event
-            ret += bytes([(event[STATUSMSG_INDX] | event[CHANNEL_INDX])])
-        ret += bytes(data)
+def encode_track(track):
+    """encodes all events of a MidiTrackBuffer, returns the encoded events without track header"""
+    buf = bytearray()
+    varlen_table = VARLEN_TABLE
+    payload = track.payload
+    running_status = None
+    running_channel = None
+    events = zip(track.status, track.channel, track.meta, track.length, track.tick, track.data_1, track.data_2,
+                 track.offset)
+    for status, channel, meta, length, tick, data_1, data_2, offset in events:
+        if 0 <= tick < VARLEN_TABLE_SIZE:
+            buf += varlen_table[tick]
+        else:
+            buf += write_varlen(tick)
+
+        if status == 0xFF:  # meta events
+            buf.append(0xFF)
+            buf.append(meta)
+            buf += write_varlen(length)
+            buf += payload[offset:offset + length]
+        elif status == 0xF0:  # Sysex events
+            buf.append(0xF0)
+            buf += write_varlen(length + 1)
+            buf += payload[offset:offset + length]
+            buf.append(0xF7)
+        else:
+            if running_status != status or running_channel != channel:
+                running_status = status
+                running_channel = channel
+                buf.append(status | channel)
+            buf.append(data_1)
+            if length == 2:
+                buf.append(data_2)
 
-    return ret, running_status
+    return buf
 
 
 def write_track(midifile, track):
     """writes the track into the midi file"""
-    buf = bytes()
-    running_status = None
-    for event in track:
-        encoded, running_status = encode_midi_event(event, running_status)
-        buf += encoded
-
-    bufbyte = encode_track_header(len(buf)) + buf
-    midifile.write(bufbyte)
+    buf = encode_track(track)
+    midifile.write(encode_track_header(len(buf)))
+    midifile.write(buf)
 
 
 def write_file_header(midifile, pattern):
@@ -121,35 +186,37 @@ def write_file_header(midifile, pattern):
     midifile.write(bytes('MThd', 'UTF-8') + packdata)
 
 
-def write_midifile(midifile, pattern):
-    """writes the midi file"""
-    midifile = open(midifile, 'wb')
-    write_file_header(midifile, pattern)
+def write_midi(midi_stream, pattern):
+    """writes the midi data of all tracks of pattern to a binary stream (file, BytesIO, socket file, ...)"""
+    write_file_header(midi_stream, pattern)
     for track in pattern:
-        write_track(midifile, track)
+        write_track(midi_stream, track)
+
+
+def encode_midi(pattern):
+    """returns the midi data of all tracks of pattern as bytes"""
+    midi_stream = io.BytesIO()
+    write_midi(midi_stream, pattern)
+    return midi_stream.getvalue()
+
+
+def write_midifile(midifilename, pattern):
+    """writes the midi file"""
+    with open(midifilename, 'wb') as midifile:
+        write_midi(midifile, pattern)
 
 
 def write_varlen(value):
-    """converts value to variable length structure"""
-    chr1 = bytes(0)
-    chr2 = bytes(0)
-    chr3 = bytes(0)
-    chr4 = bytes(0)
-    chr1 = bytes([value & 0x7F])
-    value >>= 7
-    if value:
-        chr2 = bytes([(value & 0x7F) | 0x80])
+    """converts value to variable length structure (4 bytes at most)"""
+    res = bytearray([value & 0x7F])
+    for _ in range(3):
         value >>= 7
-        if value:
-            chr3 = bytes([(value & 0x7F) | 0x80])
-            value >>= 7
-            if value:
-                chr4 = bytes([(value & 0x7F) | 0x80])
-                res = chr4 + chr3 + chr2 + chr1
-            else:
-                res = chr3 + chr2 + chr1
-        else:
-            res = chr2 + chr1
-    else:
-        res = chr1
-    return res
+        if not value:
+            break
+        res.insert(0, (value & 0x7F) | 0x80)
+    return bytes(res)
+
+
+# variable length structures of all values which need one or two bytes
+VARLEN_TABLE_SIZE = 0x4000
+VARLEN_TABLE = [write_varlen(value) for value in range(VARLEN_TABLE_SIZE)]
@@ -0,0 +1,96 @@
+# coding=utf-8
+"""
+
+Inka Algorithmic Music
+Creates fully arranged algorithmic instrumental music.
+Copyright (C) 2019  Udo Wollschläger
+
+This file contains the profiling of single compositions.
+A profiled function call writes three files:
+<name>.pstats        cProfile data, e.g. for python -m pstats or snakeviz
+<name>.collapsed.txt sampled call stacks in collapsed format (one line 'f1;f2;f3 count' per stack),
+                     e.g. for flamegraph.pl or speedscope
+<name>.json          information about the call (seed, settings, ...) and the time used
+
+"""
+
+import cProfile
+import collections
+import json
+import os
+import sys
+import threading
+import time
+
+SAMPLE_INTERVAL = 0.001  # seconds between two call stack samples
+
+# only one cProfile profiler may be active in a process (python 3.12 and later), so profiled calls of
+# several worker threads are run one after the other
+PROFILE_LOCK = threading.Lock()
+
+
+class StackSampler():
+    """
+    Samples the call stack of a thread in regular intervals, using a separate thread.
+    Only frames below stop_frame (called by stop_frame) are used.
+    """
+
+    def __init__(self, thread_id, stop_frame, interval=SAMPLE_INTERVAL):
+        self.thread_id = thread_id
+        self.stop_frame = stop_frame
+        self.interval = interval
+        self.stacks = collections.Counter()  # collapsed stack: count
+        self.stop_event = threading.Event()
+        self.sampler = threading.Thread(target=self._sample, daemon=True)
+
+    def start(self):
+        """starts sampling"""
+        self.sampler.start()
+
+    def stop(self):
+        """stops sampling"""
+        self.stop_event.set()
+        self.sampler.join()
+
+    def _sample(self):
+        """sampler thread"""
+        while not self.stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)  # pylint: disable=protected-access
+            codes = []
+            while frame is not None and frame is not self.stop_frame:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            # thread is still below stop_frame, but not waiting for the end of sampling
+            if codes and frame is not None and codes[-1] is not StackSampler.stop.__code__:
+                self.stacks[';'.join(os.path.basename(code.co_filename) + ':' + code.co_name
+                                     for code in reversed(codes))] += 1
+
+    def get_collapsed(self):
+        """returns sampled stacks in collapsed format"""
+        return ''.join(stack + ' ' + str(count) + '\n' for stack, count in sorted(self.stacks.items()))
+
+
+def run_profiled(file_name, info, function, *args, **kwargs):
+    """calls function(*args, **kwargs) with profiler and stack sampler, writes the profiling files
+       (file_name without extension, see above) and returns the result of function.
+       Profiled calls in several threads wait for each other"""
+    with PROFILE_LOCK:
+        profiler = cProfile.Profile()
+        sampler = StackSampler(threading.get_ident(), sys._getframe())  # pylint: disable=protected-access
+        start = time.perf_counter()
+        sampler.start()
+        profiler.enable()
+        try:
+            result = function(*args, **kwargs)
+        finally:
+            profiler.disable()
+            sampler.stop()
+            seconds = time.perf_counter() - start
+
+            os.makedirs(os.path.dirname(file_name) or '.', exist_ok=True)
+            profiler.dump_stats(file_name + '.pstats')
+            with open(file_name + '.collapsed.txt', 'w', encoding='utf-8') as collapsed_file:
+                collapsed_file.write(sampler.get_collapsed())
+            with open(file_name + '.json', 'w', encoding='utf-8') as info_file:
+                json.dump(dict(info, seconds=seconds, samples=sum(sampler.stacks.values())), info_file, indent=1)
+    return result
@@ -8,6 +8,7 @@ Copyright (C) 2018  Udo Wollschläger
 This file contains the rhythm algorithmic functions
 
 """
+import bisect
 import math
 import copy
 import inkamusic.const as const
@@ -17,9 +18,10 @@ from inkamusic.const import RHYTHM_BEAT_INDX, RHYTHM_PAT_INDX
 from inkamusic.const import ACC_UNDEFINED, RY_POS, RY_ACC, RY_LEV, RY_LEN
 from inkamusic.const import RM_REPEAT, RM_HARMONY_TRACK, RM_SOLO_PATTERN
 from inkamusic.const import RM_TRACK_RHYTHM, RM_VARI_TRACK_RHYTHM
-from inkamusic.const import FIRST_BAR_OF_PART, BEAT_RHYTHM
+from inkamusic.const import BEAT_RHYTHM
 
 import inkamusic.trackinfo_util as tu
+import inkamusic.utilities as utilities
 from inkamusic.basic_rhythms import RHY_PATTERN_INDX, BLOCK_ACC
 
 import inkamusic.music_parameter as mp
@@ -29,34 +31,17 @@ def get_rhythm_from_bars_and_beats(beat_indx, start_from_bar, comp_data_2):
     """start_from_bar is the global bar number (1 = first bar of composition)
        beat_indx is counted from there.
        All rhythm positions are relative to first bar entry in
-       which they appear, so they need to be shifted"""
+       which they appear, so they need to be shifted.
+       The rhythm entries are shared with bars_and_beats and must not be changed"""
 
     def shift_rhythm(rhythm, bars_to_shift):
-        shifted = copy.deepcopy(rhythm)
-        for pos in shifted:
-            pos[0] += (bars_to_shift * comp_data_2['num_of_beats'] * const.TICKSRES)
-        return shifted
-
-    len_bars_and_beats = len(comp_data_2['bars_and_beats'])
-    indx = 0
-    active = 0
-    while indx < len_bars_and_beats:
-        if comp_data_2['bars_and_beats'][indx][0] == FIRST_BAR_OF_PART:
-            current_first_bar_is = comp_data_2['bars_and_beats'][indx][1]
-
-            if current_first_bar_is == start_from_bar:
-                active = 1
-                beat_counter = 0
-
-        if active == 1:
-            if comp_data_2['bars_and_beats'][indx][0] == BEAT_RHYTHM:
-                if beat_counter == beat_indx:
-                    one_beat_rhythm = copy.deepcopy(shift_rhythm(comp_data_2['bars_and_beats'][indx][2],
-                                                                 current_first_bar_is - start_from_bar))
+        if bars_to_shift == 0:
+            return rhythm
+        shift = bars_to_shift * comp_data_2['num_of_beats'] * const.TICKSRES
+        return [[pos[0] + shift] + pos[1:] for pos in rhythm]
 
-                    break
-                beat_counter += 1
-        indx += 1
+    entry, current_first_bar_is = comp_data_2['bars_and_beats'].get_beat(BEAT_RHYTHM, start_from_bar, beat_indx)
+    one_beat_rhythm = shift_rhythm(entry.rhythm, current_first_bar_is - start_from_bar)
 
     return one_beat_rhythm
 
@@ -128,6 +113,8 @@ def check_rhythm(selected_rhythm, combined_rhythm):
     #   [5, [[0, 4], [360, 1], [720, 3], [1080, 1], [1440, 3], [1800, 1], [2160, 3], [2520, 1]]]
     # ]
 
+    combined_positions = {entry[RY_POS] for entry in combined_rhythm}
+
     for sub_rhythm in range(1, len(selected_rhythm)):
 
         for indx in range(len(selected_rhythm[sub_rhythm][RHY_PATTERN_INDX])):
@@ -136,7 +123,7 @@ def check_rhythm(selected_rhythm, combined_rhythm):
             if style_acc != BLOCK_ACC:
                 if min_acc > style_acc:
                     min_acc = style_acc
-            pos_found = exists_pos(pos, combined_rhythm)
+            pos_found = pos in combined_positions
 
             if (not pos_found and style_acc != BLOCK_ACC) or (pos_found and style_acc == BLOCK_ACC):
                 all_pos_found = False
@@ -153,9 +140,13 @@ def check_rhythm(selected_rhythm, combined_rhythm):
             add_acc = 2 - min_acc
         else:
             add_acc = 0
+        max_acc = {}  # max intensity of each position over all rhythm parts, see max_acc_of_pos
+        for rhythm_part in range(1, len(selected_rhythm)):
+            for pos, acc in selected_rhythm[rhythm_part][RHY_PATTERN_INDX]:
+                max_acc[pos] = max(acc, max_acc.get(pos, ACC_UNDEFINED))
         indx = len(combined_rhythm) - 1
         while indx >= 0:
-            acc = max_acc_of_pos(combined_rhythm[indx][RY_POS], selected_rhythm)
+            acc = max_acc.get(combined_rhythm[indx][RY_POS], ACC_UNDEFINED)
             if acc == ACC_UNDEFINED:
                 combined_rhythm[indx][RY_ACC] = 1
             else:
@@ -165,23 +156,48 @@ def check_rhythm(selected_rhythm, combined_rhythm):
     return all_pos_found
 
 
-def subdivide_rhythm(combined_rhythm, rnd_type, min_split_length):
-    """subdivides rhythm into next level
-       min_split_length is the minimum length which must remain AFTER a subdivision
-       see menu_entries.SPEED_LIST for an example"""
+def get_blocked_positions(selected_rhythm):
+    """returns the set of BLOCK_ACC positions of all rhythm parts, these must not be used in the global rhythm"""
+    blocked_positions = set()
+    for rhythm_part in range(1, len(selected_rhythm)):
+        for pos, acc in selected_rhythm[rhythm_part][RHY_PATTERN_INDX]:
+            if acc == BLOCK_ACC:
+                blocked_positions.add(pos)
+    return blocked_positions
+
+
+def draw_remaining_subdivisions(pending_lengths, next_lengths, rnd_type, min_split_length):
+    """draws the random values of all subdivisions still to be done for a rhythm that can not be used,
+       so the random sequence is the same as if the rhythm was subdivided completely.
+       Only the lengths of the positions (in order of their positions) are needed for this:
+       pending_lengths of the current level, next_lengths of the next level"""
+    rndm_choice = rnd_type[const.RNDM_BASE_RHYTHM].rndm_choice
+    while True:
+        for ry_length in pending_lengths:
+            split = rndm_choice(mp.RHYTHM_SUBDIVISION)
+            length = ry_length // split
+            if length >= min_split_length and ry_length % split == 0:
+                next_lengths.extend([length] * split)
+        if not next_lengths:
+            break
+        pending_lengths, next_lengths = next_lengths, []
 
-    def getfirst(item):
-        return item[0]
 
-    def split_position(level, length, split, position):
-        for j, ry_entry in enumerate(combined_rhythm):
-            if ry_entry[RY_POS] == position[RY_POS]:
-                del combined_rhythm[j]
-                break
-        for j in range(split):
-            ins = [position[RY_POS] + length * j, 0, level + 1, length]
-            combined_rhythm.append(ins)
-            combined_rhythm.sort(key=getfirst)
+def subdivide_rhythm(combined_rhythm, rnd_type, min_split_length, blocked_positions=None, prune=False):
+    """subdivides rhythm into next level
+       min_split_length is the minimum length which must remain AFTER a subdivision
+       see menu_entries.SPEED_LIST for an example
+       If blocked_positions (set) is given, False is returned as soon as a subdivision creates a blocked position
+       (the rhythm can not be used, the random values of the remaining subdivisions are drawn nevertheless).
+       With prune = True, subdivisions creating a blocked position are not chosen at all.
+       Returns True if no blocked position was created
+       combined_rhythm must be sorted by position (see create_combined_rhythm), each level is built as new list:
+       the new positions of a subdivision are within the subdivided position, so the order is kept"""
+
+    def creates_blocked(position, split):
+        length = position[RY_LEN] // split
+        return length >= min_split_length and position[RY_LEN] % split == 0 and \
+            any(position[RY_POS] + length * j in blocked_positions for j in range(1, split))
 
     new_level_added = True
     level = 0
@@ -206,36 +222,66 @@ def subdivide_rhythm(combined_rhythm, rnd_type, min_split_length):
 
     while new_level_added:  # level = current level, level + 1 will be constructed
         new_level_added = False
-        original_ry = copy.deepcopy(combined_rhythm)
-        for position in original_ry:
-            if position[RY_LEV] == level:
+        new_rhythm = []
+        new_lengths = []  # lengths of new positions (level + 1)
+        for indx, position in enumerate(combined_rhythm):
+            if position[RY_LEV] != level:
+                new_rhythm.append(position)
+                continue
+            if prune:
+                splits = [split for split in mp.RHYTHM_SUBDIVISION if not creates_blocked(position, split)]
+                if not splits:
+                    new_rhythm.append(position)
+                    continue
+                split = rnd_type[const.RNDM_BASE_RHYTHM].rndm_choice(splits)
+            else:
                 split = rnd_type[const.RNDM_BASE_RHYTHM].rndm_choice(mp.RHYTHM_SUBDIVISION)
-                length = (position[RY_LEN] // split)
-                if length >= min_split_length and position[RY_LEN] % split == 0:
-                    split_position(level, length, split, position)
-                    new_level_added = True
+            length = (position[RY_LEN] // split)
+            if length >= min_split_length and position[RY_LEN] % split == 0:
+                new_level_added = True
+                new_lengths.extend([length] * split)
+                if blocked_positions and not prune and \
+                        any(position[RY_POS] + length * j in blocked_positions for j in range(1, split)):
+                    draw_remaining_subdivisions([entry[RY_LEN] for entry in combined_rhythm[indx + 1:]
+                                                 if entry[RY_LEV] == level],
+                                                new_lengths, rnd_type, min_split_length)
+                    return False
+                for j in range(split):
+                    new_rhythm.append([position[RY_POS] + length * j, 0, level + 1, length])
+            else:
+                new_rhythm.append(position)
 
+        combined_rhythm[:] = new_rhythm
         level += 1
 
+    return True
+
 
-def create_global_rhythm(selected_rhythm, num_of_beats, min_split_length, rnd_type):
-    """creates the main rhythm for the composition"""
+def create_global_rhythm(selected_rhythm, num_of_beats, min_split_length, rnd_type, try_counts=None):
+    """creates the main rhythm for the composition,
+       the number of tries is stored in try_counts (dict), if given"""
 
     max_try_count = 1000
     ry_try_count = 0
 
     selected_rhythm_reached = False
 
+    # a try fails if a subdivision creates a blocked position of the selected rhythm.
+    # In compatibility mode such a try is stopped early, but the random values are drawn as before,
+    # otherwise these subdivisions are not chosen at all, so the first try is always successful
+    blocked_positions = get_blocked_positions(selected_rhythm)
+    prune = not rnd_type[const.RNDM_BASE_RHYTHM].compat
+    first_combined_rhythm = create_combined_rhythm(selected_rhythm)
+
     while not selected_rhythm_reached:
 
         ry_try_count += 1
         assert ry_try_count < max_try_count, "Selected rhythm can not be used"
 
         # initialize combined_rhythm. Combined_rhythm will be subdivided to create rhythm
-        combined_rhythm = create_combined_rhythm(selected_rhythm)
-        subdivide_rhythm(combined_rhythm, rnd_type, min_split_length)
-
-        all_pos_found = check_rhythm(selected_rhythm, combined_rhythm)
+        combined_rhythm = [list(entry) for entry in first_combined_rhythm]
+        all_pos_found = subdivide_rhythm(combined_rhythm, rnd_type, min_split_length, blocked_positions, prune) \
+            and check_rhythm(selected_rhythm, combined_rhythm)
 
         if all_pos_found:
             global_rhythm = [num_of_beats, []]
@@ -243,6 +289,8 @@ def create_global_rhythm(selected_rhythm, num_of_beats, min_split_length, rnd_ty
                 global_rhythm[1].append([i[RY_POS], i[RY_ACC]])
             selected_rhythm_reached = True
             selected_rhythm_stripped = strip_blocked(copy.deepcopy(selected_rhythm))
+    if try_counts is not None:
+        try_counts['global_rhythm'] = ry_try_count
     if const.DEBUG_OUTPUT:
         print(' ')
         print('global rhythm is', global_rhythm)
@@ -299,81 +347,102 @@ def check_max_tones_per_s(track_rhythm, max_tones_per_s, bpm):
     return True, 0
 
 
-def remove_one(track_rhythm, intensity_dependency_val, crit_time_diff, rndm_2):
-    """removes one position from rhythm, with probability depending on intensity"""
+class PositionRemover():
+    """
+    Removes positions from a track rhythm one by one, with probability depending on intensity:
+    the removal weight of a position is 100 / intensity_dependency_val ** intensity.
+    The weights and their prefix sums are kept between removals, after a removal only the weights of the
+    neighbours (and of the last position) are calculated again, and the prefix sums from there on.
+    The prefix sums are added in the same order as in a complete calculation, so the same positions are removed.
+    """
 
-    def dist2nearest_neighbour(i, num, pat):
+    def __init__(self, track_rhythm, intensity_dependency_val, rndm_2):
+        self.pat = track_rhythm[RHYTHM_PAT_INDX]
+        self.bar_length = track_rhythm[RHYTHM_BEAT_INDX] * const.TICKSRES
+        self.intensity_dependency_val = intensity_dependency_val
+        self.rndm = rndm_2[const.RNDM_MELO_RHYTHM]
+        self.inverse_weights = {}  # intensity: 100 / intensity_dependency_val ** intensity
+        self.crit_time_diff = None  # weights are not calculated yet
+        self.weights = []
+        self.prefix_sums = []
+
+    def dist2nearest_neighbour(self, i):
+        """returns distance to nearest position (rhythm is repeated in each bar)"""
+        pat = self.pat
+        num = len(pat)
         if num <= 1:
-            return crit_time_diff+1  # do nothing
+            return self.crit_time_diff + 1  # do nothing
         if i == num - 1:
-            dist1 = pat[i][0] - pat[i - 1][0]
-            dist2 = pat[0][0] - pat[i][0] + numbeats * const.TICKSRES
-            return min(dist1, dist2)
+            return min(pat[i][0] - pat[i - 1][0], pat[0][0] - pat[i][0] + self.bar_length)
         if i == 0:
-            dist1 = numbeats * const.TICKSRES - (pat[num - 1][0] - pat[0][0])
-            dist2 = pat[i + 1][0] - pat[i][0]
-            return min(dist1, dist2)
-
-        dist1 = pat[i][0] - pat[i - 1][0]
-        dist2 = pat[i + 1][0] - pat[i][0]
-        return min(dist1, dist2)
-
-    def calc_p_sum(pat):
-        """calculates a weighted sum for intensity dependent removal probability"""
+            return min(self.bar_length - (pat[num - 1][0] - pat[0][0]), pat[i + 1][0] - pat[i][0])
+        return min(pat[i][0] - pat[i - 1][0], pat[i + 1][0] - pat[i][0])
 
-        num = len(pat)
-        # example pat: [[0, 5], [360, 2], [720, 4], [1080, 2], [1440, 4], [1800, 2], [2160, 4]]
-
-        intens_weighted_sum = 0.0
-
-        for i in range(num):
-            intens = get_intensity(i, num, pat)
-            # intensities for example: 5 2 4 2 4 2 4
-
-            inverse_weight = math.pow(intensity_dependency_val, intens)
-            # inverse weights for example: 243, 9, 81, 9, 81, 9, 81 (intensity_dependency_val is 3)
-
-            intens_weighted_sum += 100.0 / inverse_weight  # 100 only to get nice numbers
-
-        return intens_weighted_sum
-
-    def get_intensity(i, num, pat):
+    def get_weight(self, i):
+        """returns removal weight of position i"""
+        intens = self.pat[i][1]
         # decrease remove prob (by increasing intensity) for low intensity position near end of bar
         # (up beat for better rhythmic flow)
-        if i == num - 1:
-            intens = pat[i][1]
-            if intens < 2:
-                intens += 1.0
-        else:
-            intens = pat[i][1]
-
-        if crit_time_diff > 0:  # increase remove prob for positions too near to each other
-            if dist2nearest_neighbour(i, num, pat) <= crit_time_diff:
+        if i == len(self.pat) - 1 and intens < 2:
+            intens += 1.0
+        if self.crit_time_diff > 0:  # increase remove prob for positions too near to each other
+            if self.dist2nearest_neighbour(i) <= self.crit_time_diff:
                 intens -= 2.0
 
-        return intens
+        weight = self.inverse_weights.get(intens)
+        if weight is None:
+            # example: intensity_dependency_val 3, intensity 5 => 100 / 243
+            weight = 100.0 / math.pow(self.intensity_dependency_val, intens)  # 100 only to get nice numbers
+            self.inverse_weights[intens] = weight
+        return weight
+
+    def update(self, first, indices):
+        """calculates the weights of indices again and the prefix sums from first on"""
+        for i in indices:
+            self.weights[i] = self.get_weight(i)
+        del self.prefix_sums[first:]
+        prefix_sum = self.prefix_sums[-1] if first else 0.0
+        for i in range(first, len(self.weights)):
+            prefix_sum += self.weights[i]
+            self.prefix_sums.append(prefix_sum)
+
+    def remove_one(self, crit_time_diff=0):
+        """removes one position"""
+        num = len(self.pat)
+        assert num > 0, "num == 0"
+
+        if crit_time_diff != self.crit_time_diff:
+            self.crit_time_diff = crit_time_diff
+            self.weights = [0.0] * num
+            self.update(0, range(num))
+
+        choose_random = self.rndm.rndm_random() * self.prefix_sums[-1]
+        indx = bisect.bisect_left(self.prefix_sums, choose_random)  # first position with sum >= choose_random
+        if indx == num:
+            return
+        del self.pat[indx]
+        del self.weights[indx]
+        num -= 1
+        if num == 0:
+            self.prefix_sums = []
+            return
+
+        # changed: last position, and (if positions too near to each other are checked) the neighbours
+        indices = {num - 1}
+        if crit_time_diff > 0:
+            indices.update(((indx - 1) % num, indx % num))
+        if indx < num:
+            # the positions after indx have moved, so the prefix sums from indx on do not contain their weights
+            first = min(indices | {indx})
+        else:  # last position was removed, the prefix sums before are unchanged
+            first = min(indices)
+        self.update(first, indices)
 
-    def remove_selected(pat, choose_random):
-        """removes the selected entry"""
-        num = len(pat)
-        intens_weighted_sum = 0.0
-
-        for i in range(num):
-            intens = get_intensity(i, num, pat)
-            inverse_weight = math.pow(intensity_dependency_val, intens)
-            intens_weighted_sum += 100.0 / inverse_weight  # 100 only to get nice numbers
-            if intens_weighted_sum >= choose_random:
-                del pat[i]
-                break
-
-    num = len(track_rhythm[RHYTHM_PAT_INDX])
-    numbeats = track_rhythm[RHYTHM_BEAT_INDX]
-    assert num > 0, "num == 0"
-
-    intens_weighted_sum = calc_p_sum(track_rhythm[RHYTHM_PAT_INDX])
 
-    choose_random = rndm_2[const.RNDM_MELO_RHYTHM].rndm_random() * intens_weighted_sum
-    remove_selected(track_rhythm[RHYTHM_PAT_INDX], choose_random)
+def remove_one(track_rhythm, intensity_dependency_val, crit_time_diff, rndm_2):
+    """removes one position from rhythm, with probability depending on intensity
+       (use PositionRemover to remove several positions)"""
+    PositionRemover(track_rhythm, intensity_dependency_val, rndm_2).remove_one(crit_time_diff)
 
 
 def set_connection_types(track_info, track_rhythm, actual_num_of_tones, rndm_2):
@@ -385,18 +454,20 @@ def set_connection_types(track_info, track_rhythm, actual_num_of_tones, rndm_2):
     num = len(track_rhythm[RHYTHM_PAT_INDX])
     assert num == actual_num_of_tones, "Should not happen, num != actual_num_of_tones"
 
-    for i in range(actual_num_of_tones):
-        if track_info_connect[0] in [const.AUTODAMP_PERC, const.AUTODAMP_MELO]:
-            connection_type = const.CONNECT_AUTODAMP
-        else:
-            ct_rndm = rndm_2[const.RNDM_MELO_RHYTHM].rndm_int(1, 100)
+    if track_info_connect[0] in [const.AUTODAMP_PERC, const.AUTODAMP_MELO]:
+        for i in range(actual_num_of_tones):
+            track_rhythm[RHYTHM_PAT_INDX][i].append(const.CONNECT_AUTODAMP)
+    else:
+        # draw random values for all positions at once
+        ct_rndm_values = rndm_2[const.RNDM_MELO_RHYTHM].rndm_int_n(1, 100, actual_num_of_tones)
+        for i, ct_rndm in enumerate(ct_rndm_values):
             if ct_rndm <= track_info_connect[0]:
                 connection_type = const.CONNECT_LEGATO
             elif ct_rndm <= track_info_connect[0] + track_info_connect[1]:
                 connection_type = const.CONNECT_STANDARD
             else:
                 connection_type = const.CONNECT_STACCATO
-        track_rhythm[RHYTHM_PAT_INDX][i].append(connection_type)
+            track_rhythm[RHYTHM_PAT_INDX][i].append(connection_type)
 
     return track_rhythm
 
@@ -443,11 +514,11 @@ def correct_tones_per_sec(track_rhythm, track_info, bpm, rndm_2):
     # avg_tones_per_sec_ok will be False if the time difference is too small between adjacent positions, on average
     # over all positions of a bar
     avg_tones_per_sec_ok = avg_tones_per_sec < 0.8 * max_tones_per_sec
+    intens_dependency = 50
+    position_remover = PositionRemover(track_rhythm, intens_dependency, rndm_2)
     while not max_tones_per_sec_ok or not avg_tones_per_sec_ok:
 
-        intens_dependency = 50
-
-        remove_one(track_rhythm, intens_dependency, crit_time_diff, rndm_2)
+        position_remover.remove_one(crit_time_diff)
 
         max_tones_per_sec_ok, crit_time_diff = check_max_tones_per_s(track_rhythm, max_tones_per_sec, bpm)
         avg_tones_per_sec = calc_rhythm_speed(track_rhythm, bpm)
@@ -463,7 +534,7 @@ def create_track_rhythm(track_info, global_rhythm, bpm, selected_speed, rndm_2):
     def number_of_tones_array(num):
         return [i for i in range(1, num+1)]
 
-    track_rhythm = copy.deepcopy(global_rhythm)
+    track_rhythm = [global_rhythm[RHYTHM_BEAT_INDX], [list(pos) for pos in global_rhythm[RHYTHM_PAT_INDX]]]
 
     correct_tones_per_sec(track_rhythm, track_info, bpm, rndm_2)
 
@@ -489,9 +560,10 @@ def create_track_rhythm(track_info, global_rhythm, bpm, selected_speed, rndm_2):
 
     intensity_dependency_val = get_intensity_dependency_val(track_info, rndm_2)
 
+    position_remover = PositionRemover(track_rhythm, intensity_dependency_val, rndm_2)
     while actual_num_of_tones > use_num_of_tones:
 
-        remove_one(track_rhythm, intensity_dependency_val, 0, rndm_2)
+        position_remover.remove_one()
 
         actual_num_of_tones -= 1
 
@@ -737,7 +809,7 @@ def rhythm_generator(beat_indx, rhythm_rule, comp_data, comp_data_2, bar_distrib
 
     if rhythm_rule in [RM_SOLO_PATTERN, RM_TRACK_RHYTHM, RM_VARI_TRACK_RHYTHM]:
 
-        if bar_distribution[actual_global_bar_num][const.PLAYED_IN_TRACK + comp_data['track_id']] == 0:
+        if bar_distribution[actual_global_bar_num].played_in_track[comp_data['track_id']] == 0:
             use_pause = True
 
     if use_pause:
@@ -839,14 +911,14 @@ def loop_beats(rhythm_rule, rpt, bar_distribution, comp_data, c_2):
 
         one_beat_rhythm = rhythm_generator(beat_indx, rhythm_rule, comp_data, c_2, bar_distribution)
 
-        c_2['bars_and_beats'].append([BEAT_RHYTHM, beat_indx, one_beat_rhythm])
+        c_2['bars_and_beats'].append(utilities.BeatRhythm(BEAT_RHYTHM, beat_indx, one_beat_rhythm))
         if comp_data['track_id'] != const.HARMONY_TRACK:
             is_percussion_instrument = not tu.is_melody_instrument(comp_data['track_info'])
 
             for i in one_beat_rhythm:
                 pos_conn_intens.append(i)
                 if is_percussion_instrument:
-                    c_2['tones'].append(0)  # dummy, no tones heights for percussion instruments
+                    c_2['composed_track'].append_tones([])  # no tones heights for percussion instruments
         beat_indx += 1
     return pos_conn_intens
 
@@ -9,6 +9,7 @@ This file defines all settings used to create a musical piece
 
 """
 
+import collections
 import copy
 import inkamusic.const as const
 from inkamusic.const import RNDM_STRUCTURE
@@ -18,22 +19,47 @@ import inkamusic.menu_entries as me
 import inkamusic.music_parameter as mp
 
 
+# instruments not selected by get_instrument_by_property, if LOGIC_PRO_MIDI_SETTINGS is used
+BLOCK_FOR_LOGIC_PRO_LIST = [134, 142, 150, 158, 638, 639, 640, 641, 642, 643, 644]
+
+
+def build_instrument_catalog(instruments):
+    """returns the instrument catalog: a tuple of all instrument definitions (tuples, never changed) and
+       dicts to look up definitions by id, by (type, type_2) and by (name, type, type_2).
+       An empty name (and midi id) is replaced by the name (and midi id) of the definition before"""
+    catalog = []
+    for instrument in instruments:
+        if instrument[const.INSTRUMENT_TXT_INDX] == '':
+            name, midi = catalog[-1][const.INSTRUMENT_TXT_INDX], catalog[-1][const.INSTRUMENT_MIDI_INDX]
+        else:
+            name, midi = instrument[const.INSTRUMENT_TXT_INDX], tuple(instrument[const.INSTRUMENT_MIDI_INDX])
+        catalog.append((name, instrument[const.INSTRUMENT_ID_INDX], midi) + tuple(instrument[3:]))
+
+    by_id = {}
+    by_property = collections.defaultdict(list)
+    by_name_and_property = {}
+    for instrument in catalog:
+        by_id.setdefault(instrument[const.INSTRUMENT_ID_INDX], instrument)
+        properties = (instrument[const.INSTRUMENT_TYPE_INDX], instrument[const.INSTRUMENT_TYPE_2_INDX])
+        if not mp.LOGIC_PRO_MIDI_SETTINGS or instrument[const.INSTRUMENT_ID_INDX] not in BLOCK_FOR_LOGIC_PRO_LIST:
+            by_property[properties].append(instrument)
+        by_name_and_property.setdefault((instrument[const.INSTRUMENT_TXT_INDX],) + properties, instrument)
+
+    return (tuple(catalog), by_id, {properties: tuple(entries) for properties, entries in by_property.items()},
+            by_name_and_property)
+
+
+# built once, the catalog is only read afterwards, so it may be used by several threads
+INSTRUMENTS, INSTRUMENTS_BY_ID, INSTRUMENTS_BY_PROPERTY, INSTRUMENTS_BY_NAME_AND_PROPERTY \
+    = build_instrument_catalog(gm)
+
+
 def get_instrument_by_id(instru_id):
     """looks up instrument definition for given id"""
 
-    num_of_instruments = len(gm)
-    indx = 0
-    while indx < num_of_instruments:
-        if gm[indx][const.INSTRUMENT_ID_INDX] == instru_id:
-            indx_2 = indx - 1
-            while gm[indx][const.INSTRUMENT_TXT_INDX] == '':
-                gm[indx][const.INSTRUMENT_TXT_INDX] = gm[indx_2][const.INSTRUMENT_TXT_INDX]
-                gm[indx][const.INSTRUMENT_MIDI_INDX] = gm[indx_2][const.INSTRUMENT_MIDI_INDX]
-                indx_2 -= 1
-
-            return gm[indx]
-        indx += 1
-    assert False, "Instrument ID not found, "+repr(instru_id)
+    instrument = INSTRUMENTS_BY_ID.get(instru_id)
+    assert instrument is not None, "Instrument ID not found, "+repr(instru_id)
+    return instrument
 
 
 def get_instrument_type(instru_id):
@@ -46,56 +72,18 @@ def get_instrument_type(instru_id):
 def get_instrument_by_property(instru_type, instru_type_2, rndm_2):
     """ selects instrument with specific properties randomly """
 
-    block_for_logic_pro_list = [134, 142, 150, 158, 638, 639, 640, 641, 642, 643, 644]
-
-    num_of_instruments = len(gm)
-    indx = 0
-    count = 0
-    while indx < num_of_instruments:
-        if gm[indx][const.INSTRUMENT_TYPE_INDX] == instru_type \
-         and gm[indx][const.INSTRUMENT_TYPE_2_INDX] == instru_type_2:
-            if not mp.LOGIC_PRO_MIDI_SETTINGS:
-                count += 1
-            elif gm[indx][const.INSTRUMENT_ID_INDX] not in block_for_logic_pro_list:
-                count += 1
-
-        indx += 1
-    assert count > 0, "Instrument properties not found"
-
-    use_instru = rndm_2[const.RNDM_INSTRU].rndm_int(1, count)
-    indx = 0
-    count = 0
-    while indx < num_of_instruments:
-        if gm[indx][const.INSTRUMENT_TYPE_INDX] == instru_type \
-         and gm[indx][const.INSTRUMENT_TYPE_2_INDX] == instru_type_2:
-            if not mp.LOGIC_PRO_MIDI_SETTINGS:
-                count += 1
-            elif gm[indx][const.INSTRUMENT_ID_INDX] not in block_for_logic_pro_list:
-                count += 1
-            if count == use_instru:
-                return gm[indx]
-        indx += 1
+    instruments = INSTRUMENTS_BY_PROPERTY.get((instru_type, instru_type_2), ())
+    assert instruments, "Instrument properties not found"
+
+    return instruments[rndm_2[const.RNDM_INSTRU].rndm_int(1, len(instruments)) - 1]
 
 
 def get_instrument_by_name_and_property(name, instru_type, instru_type_2):
     """ selects instrument with specific properties """
 
-    num_of_instruments = len(gm)
-    indx = 0
-    count = 0
-    while indx < num_of_instruments:
-        if gm[indx][const.INSTRUMENT_TYPE_INDX] == instru_type \
-         and gm[indx][const.INSTRUMENT_TYPE_2_INDX] == instru_type_2:
-            indx_2 = indx - 1
-            while gm[indx][const.INSTRUMENT_TXT_INDX] == '':
-                gm[indx][const.INSTRUMENT_TXT_INDX] = gm[indx_2][const.INSTRUMENT_TXT_INDX]
-                gm[indx][const.INSTRUMENT_MIDI_INDX] = gm[indx_2][const.INSTRUMENT_MIDI_INDX]
-                indx_2 -= 1
-            if gm[indx][const.INSTRUMENT_TXT_INDX] == name:
-                return gm[indx]
-
-        indx += 1
-    assert count > 0, "Instrument properties not found"
+    instrument = INSTRUMENTS_BY_NAME_AND_PROPERTY.get((name, instru_type, instru_type_2))
+    assert instrument is not None, "Instrument properties not found"
+    return instrument
 
 
 def get_length_min(txt=''):
@@ -183,64 +171,49 @@ def get_pause_probability(instrument_type, instrument_type_2, rndm_2):
     return rndm_2[const.RNDM_INSTRU].rndm_choice(mp.INSTRU_PAUSE_PROB[index]) / 100
 
 
+# selections of the web interface for one composition, already converted into settings values.
+# Selections are never changed, settings derived from them are held in the Settings object of each composition
+Selections = collections.namedtuple('Selections', ['instrumentation', 'scale', 'percussion', 'rhythm',
+                                                   'rhythm_bpm', 'length', 'speed'])
+
+
+def parse_web_selections(web_settings):
+    """returns Selections for the settings from web interface"""
+
+    length = get_length_sec(web_settings['sel_lengthsec']) + 60 * get_length_min(web_settings['sel_lengthmin'])
+    if length == 0:  # correct special case 0
+        length = 5
+
+    return Selections(instrumentation=get_instrumentation(web_settings['sel_instrumentation']),
+                      scale=get_scale(web_settings['sel_scales']),
+                      percussion=get_percussion(web_settings['sel_percussion']),
+                      rhythm=get_rhythm(web_settings['sel_rhythms']),
+                      rhythm_bpm=get_rhythm_bpm(web_settings['sel_rhythms']),
+                      length=length,
+                      speed=get_speed(web_settings['sel_speed']))
+
+
 class Settings():
-    """ This class defines all possible settings and menu entries
+    """ This class holds all settings of one composition: the selections from web interface
+        and the settings derived from them, typically using random numbers.
+        A new object is used for each composition, so compositions may be created concurrently.
     """
 
-    def __init__(self):
-        self.comp_data = {'selected_rhythm': None,
-                          'bpm': None,
-                          'selected_length': None,
+    def __init__(self, selections):
+        self.selections = selections
+        self.comp_data = {'bpm': None,
                           'smallest_part_length': None,
                           'intro_length': None,
                           'ending_length': None,
                           'bridge_length': None,
                           'staccato_flag': None,
-                          'selected_instrumentation': None,
-                          'selected_scale': [],
-                          'selected_percussion': None,
-                          'selected_speed': None
+                          'selected_scale': copy.deepcopy(selections.scale),  # wildcards are replaced later
                           }
         self.basic_rhythm_list = basic_rhythms.BasicRhythm()
 
-    def reset(self):
-        """ resets all settings"""
-        self.comp_data = {'selected_rhythm': None,
-                          'bpm': None,
-                          'selected_length': None,
-                          'smallest_part_length': None,
-                          'intro_length': None,
-                          'ending_length': None,
-                          'bridge_length': None,
-                          'staccato_flag': None,
-                          'selected_instrumentation': None,
-                          'selected_scale': None,
-                          'selected_percussion': None,
-                          'selected_speed': None
-                          }
-
-    def set_web_interface_selections(self, web_settings):
-        """set all settings from web interface"""
-
-        self.__set_selected_instrumentation(web_settings['sel_instrumentation'])
-        self.__set_selected_scale(web_settings['sel_scales'])
-        self.__set_selected_percussion(web_settings['sel_percussion'])
-        self.__set_selected_rhythm(web_settings['sel_rhythms'])
-        self.__set_selected_length(web_settings['sel_lengthmin'], web_settings['sel_lengthsec'])
-        self.__set_selected_speed(web_settings['sel_speed'])
-
-    def __set_selected_instrumentation(self, txt):
-        """sets instrument id list of selected instrumentation"""
-        self.comp_data['selected_instrumentation'] = get_instrumentation(txt)
-
     def get_selected_instrumentation(self):
         """returns id list of selected instrumentation"""
-        assert self.comp_data['selected_instrumentation'] is not None, "Selected instrumentation was not set"
-        return self.comp_data['selected_instrumentation']
-
-    def __set_selected_scale(self, txt):
-        """sets selected scale"""
-        self.comp_data['selected_scale'] = copy.deepcopy(get_scale(txt))  # copy is used as wildcards are replaced later
+        return self.selections.instrumentation
 
     def get_selected_scale(self):
         """returns the currently selected scale"""
@@ -271,28 +244,17 @@ class Settings():
 
                 print('harmony used is', harmony_object.get_harmony_steps_from_type(harmony_type))
 
-    def __set_selected_percussion(self, txt):
-        """sets selected percussion option"""
-        self.comp_data['selected_percussion'] = get_percussion(txt)
-
     def get_selected_percussion(self):
         """returns percussion setting"""
-        return self.comp_data['selected_percussion']
-
-    def __set_selected_rhythm(self, txt):
-        """sets id of rhythm selected in web interface"""
-        self.comp_data['selected_rhythm'] = get_rhythm(txt)
-        self.comp_data['selected_rhythm_bpm'] = get_rhythm_bpm(txt)
+        return self.selections.percussion
 
     def get_selected_rhythm(self):
         """returns id of selected rhythm"""
-        assert self.comp_data['selected_rhythm'] is not None, "Selected rhythm was not set"
-        return self.comp_data['selected_rhythm']
+        return self.selections.rhythm
 
     def get_selected_rhythm_bpm(self):
         """returns bpm range of selected rhythm"""
-        assert self.comp_data['selected_rhythm_bpm'] is not None, "Selected rhythm_bpm was not set"
-        return self.comp_data['selected_rhythm_bpm']
+        return self.selections.rhythm_bpm
 
     def get_num_of_beats(self):
         """returns num of beats per bar for selected rhythm"""
@@ -308,27 +270,13 @@ class Settings():
         rhythm = self.basic_rhythm_list.get_basic_rhythm_by_id(r_id)
         return rhythm
 
-    def __set_selected_length(self, txtmin, txtsec):
-        """sets current length"""
-        self.comp_data['selected_length'] = get_length_sec(txtsec) + 60 * get_length_min(txtmin)
-
-        # correct special case 0
-        if self.comp_data['selected_length'] == 0:
-            self.comp_data['selected_length'] = 5
-
     def get_selected_length(self):
         """returns selected length in seconds"""
-        assert self.comp_data['selected_length'] is not None, "Selected length was not set"
-        return self.comp_data['selected_length']
-
-    def __set_selected_speed(self, txt):
-        """sets selected speed"""
-        self.comp_data['selected_speed'] = get_speed(txt)
+        return self.selections.length
 
     def get_selected_speed(self):
         """returns bpm limits of selected speed"""
-        assert self.comp_data['selected_speed'] is not None, "Selected speed was not set"
-        return self.comp_data['selected_speed']
+        return self.selections.speed
 
     # bpm (beats per minute) functions (not directly set in web interface)
     # pylint: disable=locally-disabled, unsubscriptable-object
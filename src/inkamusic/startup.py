@@ -61,4 +61,9 @@ def start():
     print('to access the local web user interface.')
     print(' ')
 
-    cherrypy.quickstart(webutilities.InkaAlgorithmicMusicWebInterface(), '/', CONF)
+    # compositions are created by worker processes, using all cpu cores
+    num_of_processes = const.JOB_PROCESSES or os.cpu_count()
+    web_interface = webutilities.InkaAlgorithmicMusicWebInterface(num_of_processes=num_of_processes)
+    cherrypy.engine.subscribe('stop', web_interface.process_pool.shutdown)
+
+    cherrypy.quickstart(web_interface, '/', CONF)
@@ -9,6 +9,7 @@ This file defines all composition structures
 
 """
 
+import collections
 import copy
 import inkamusic.const as const
 from inkamusic.const import SUB_INDX, PROP_INDX, LEN_INDX, PROP_USEPART, PROP_INTRO_BRIDGE_END, NO_REPEAT
@@ -18,6 +19,11 @@ from inkamusic.const import BAR_GROUP, BAR_INFO, BAR_REPEATED, BAR_NOT_REPEATED
 import inkamusic.utilities as utilities
 import inkamusic.music_parameter as mp
 
+# entries of the bar structure, see CompositionStructure.create_bar_structure
+BarGroup = collections.namedtuple('BarGroup', ['record_type', 'first_bar', 'num_of_bars'])
+BarInfo = collections.namedtuple('BarInfo', ['record_type', 'bar_indx', 'type_and_first_bar_of_group',
+                                             'original_bar_num', 'create_type'])
+
 
 def get_minimum_length(strc, min_len, melody_length):
     """ calculates minimum num of bars needed for struct """
@@ -607,14 +613,16 @@ class CompositionStructure():
         i = 0
         active = 0
         while i < max_bar_struct:
-            if self.bar_struct[i][0] == BAR_GROUP:
-                start_bar_of_group = self.bar_struct[i][1]  # global number of first bar in group
+            bar_struct_entry = self.bar_struct[i]
+            if bar_struct_entry.record_type == BAR_GROUP:
+                start_bar_of_group = bar_struct_entry.first_bar  # global number of first bar in group
                 active = 1
                 local_bar_indx = global_bar_num - start_bar_of_group
                 # this local_bar_indx may or may not exist within the current group
                 # if not, the bar will be found in a following group
-            if active == 1 and self.bar_struct[i][0] == BAR_INFO and self.bar_struct[i][1] == local_bar_indx:
-                return self.bar_struct[i][3]  # this is the original bar number
+            if active == 1 and bar_struct_entry.record_type == BAR_INFO and \
+                    bar_struct_entry.bar_indx == local_bar_indx:
+                return bar_struct_entry.original_bar_num
             i += 1
         return -1, -1
 
@@ -644,7 +652,7 @@ class CompositionStructure():
 
         num_of_first_bar = comp_struct[part_id][PROP_INDX][PROP_ACTUAL_BAR]
         cr_type = comp_struct[part_id][PROP_INDX][PROP_INTRO_BRIDGE_END]
-        self.bar_struct.append([BAR_GROUP, num_of_first_bar, num_bars])
+        self.bar_struct.append(BarGroup(BAR_GROUP, num_of_first_bar, num_bars))
 
         bar_indx = 0
         while bar_indx < num_bars:
@@ -658,20 +666,21 @@ class CompositionStructure():
                 self.get_bar_info(use_type, bar_indx, num_of_first_bar, rpt_from_bar)
 
             if type_and_first_bar_of_group != []:
-                self.bar_struct.append([BAR_INFO, bar_indx, type_and_first_bar_of_group, original_bar_num, cr_type])
+                self.bar_struct.append(BarInfo(BAR_INFO, bar_indx, type_and_first_bar_of_group, original_bar_num,
+                                               cr_type))
                 bar_indx += 1
 
     def create_bar_structure(self, comp_struct, level):
         """This function serialises the hierarchical structure of the composition given by comp_struct.
            The resulting array self.bar_struct contains a start record for each group of bars
-           ( bar_struct[i] = [BAR_GROUP, number of first bar in group, length of group]) and then the
+           ( bar_struct[i] = BarGroup(BAR_GROUP, number of first bar in group, length of group)) and then the
            individual bars of the group
            (bar_struct[i + j] =
-           [BAR_INFO,
+           BarInfo(BAR_INFO,
            bar index within group,
            [BAR_REPEATED or BAR_NOT_REPEATED,
            number of first bar in group],
-           original bar number, create_type])
+           original bar number, create_type))
            A bar group is identified by its first bar number.
         """
 
@@ -703,14 +712,14 @@ class CompositionStructure():
         """ shows bar_struct structure for debugging purposes"""
         if const.DEBUG_OUTPUT:
             print(' ')
-            for i in range(len(self.bar_struct)):
-                if self.bar_struct[i][0] == BAR_GROUP:
+            for bar_struct_entry in self.bar_struct:
+                if bar_struct_entry.record_type == BAR_GROUP:
                     print(' ')
-                    print('Now follows group of', self.bar_struct[i][2], 'bars, starting with global bar number',
-                          self.bar_struct[i][1])
+                    print('Now follows group of', bar_struct_entry.num_of_bars, 'bars, starting with global bar number',
+                          bar_struct_entry.first_bar)
                 else:
-                    if self.bar_struct[i][2][0] == BAR_REPEATED:
+                    if bar_struct_entry.type_and_first_bar_of_group[0] == BAR_REPEATED:
                         txt = ': Repeat global bar'
                     else:
                         txt = ': Create global bar'
-                    print('  group bar', self.bar_struct[i][1], txt, self.bar_struct[i][3])
+                    print('  group bar', bar_struct_entry.bar_indx, txt, bar_struct_entry.original_bar_num)
@@ -8,6 +8,8 @@ Copyright (C) 2018  Udo Wollschläger
 This file contains utility functions
 
 """
+import array
+import collections
 import random
 import math
 import inkamusic.const as const
@@ -16,6 +18,29 @@ from inkamusic.const import PROP_USEPART, PROP_INTRO_BRIDGE_END, PROP_FROM_BAR,
 import inkamusic.music_parameter as mp
 
 
+class RndmLegacyState():
+    """
+    Older versions of Rndm shared the module global generator of the random module and left it
+    in the state of the random class used last. Code which still used the global generator directly
+    (random.shuffle in bar_distribution) therefore continued the sequence of that random class
+    without advancing it.
+    This class reproduces that behaviour for all random classes of one composition, so that
+    existing seed and instrumentation ID values still create the same composition.
+    """
+    def __init__(self):
+        self.last_used = None  # random class which was used last
+        self.generator = None  # copy of the last used generator, advanced by legacy draws only
+
+    def get_generator(self, rndm_class):
+        """returns the generator which takes the place of the former global generator"""
+        if self.generator is None:
+            if self.last_used is not None:
+                rndm_class = self.last_used
+            self.generator = random.Random()
+            self.generator.setstate(rndm_class.generator.getstate())
+        return self.generator
+
+
 class Rndm():
     """
     Implements standard random functions independently (i. e. with separate seed values)
@@ -28,67 +53,322 @@ class Rndm():
     Rhythm
     Melody
 
+    Each random class owns its own generator object.
+    With compat = True all functions return exactly the same values as older versions, which
+    switched the state of the global generator for each call.
+    With compat = False faster variants are used for rndm_int and rndm_choice (without weights)
+    and rndm_shuffle uses the generator of the random class itself, so the same seed values
+    result in different compositions.
     """
-    def __init__(self, seed):
-        random.seed(a=seed)
-        self.rndm_state = random.getstate()
+    def __init__(self, seed, compat=True, legacy_state=None):
+        self.generator = random.Random(seed)
+        self.compat = compat
+        if legacy_state is None:
+            legacy_state = RndmLegacyState()
+        self.legacy_state = legacy_state
+
+    def _use(self):
+        """marks this random class as the one used last"""
+        self.legacy_state.last_used = self
+        self.legacy_state.generator = None
 
     def rndm_int(self, lower, upper):
         """
         replaces standard randint function
         """
-        random.setstate(self.rndm_state)
-        random_value = random.randint(lower, upper)
-        self.rndm_state = random.getstate()
-        return random_value
+        if self.compat:
+            self._use()
+            return self.generator.randint(lower, upper)
+        return lower + int(self.generator.random() * (upper - lower + 1))
 
     def rndm_choice(self, seq, weights=None):
         """
         replaces standard choice function
         """
-        random.setstate(self.rndm_state)
-        random_value = random.choices(seq, weights)
-        self.rndm_state = random.getstate()
-        return random_value[0]
+        if self.compat:
+            self._use()
+        elif weights is None:
+            return seq[int(self.generator.random() * len(seq))]
+        return self.generator.choices(seq, weights)[0]
 
     def rndm_uniform(self, lower, upper):
         """
         replaces standard uniform function
         """
-        random.setstate(self.rndm_state)
-        random_value = random.uniform(lower, upper)
-        self.rndm_state = random.getstate()
-        return random_value
+        if self.compat:
+            self._use()
+        return self.generator.uniform(lower, upper)
 
     def rndm_random(self):
         """
         replaces standard random function
         """
-        random.setstate(self.rndm_state)
-        random_value = random.random()
-        self.rndm_state = random.getstate()
-        return random_value
+        if self.compat:
+            self._use()
+        return self.generator.random()
 
     def rndm_gauss_limit(self, param):
         """
         replaces standard gauss function and allows to define upper and lower limits
         param is [mean, delta, lower, upper]
         """
-        random.setstate(self.rndm_state)
+        if self.compat:
+            self._use()
         if param[2] == param[3]:
-            lower = param[2]
-            condition = True
-        elif param[1] == 0:
-            lower = param[0]
-            condition = True
-        else:
-            condition = False
-        while not condition:
-            lower = random.gauss(param[0], param[1])
+            return param[2]
+        if param[1] == 0:
+            return param[0]
+        gauss = self.generator.gauss
+        while True:
+            lower = gauss(param[0], param[1])
             if param[2] <= lower <= param[3]:
-                condition = True
-        self.rndm_state = random.getstate()
-        return lower
+                return lower
+
+    def rndm_int_n(self, lower, upper, num):
+        """
+        returns a list of num rndm_int values
+        same values as num calls of rndm_int
+        """
+        if self.compat:
+            if num > 0:
+                self._use()
+            randint = self.generator.randint
+            return [randint(lower, upper) for _ in range(num)]
+        rnd = self.generator.random
+        width = upper - lower + 1
+        return [lower + int(rnd() * width) for _ in range(num)]
+
+    def rndm_choice_n(self, seq, weights=None, num=1):
+        """
+        returns a list of num rndm_choice values, all chosen with the same weights
+        same values as num calls of rndm_choice
+        """
+        if self.compat:
+            if num > 0:
+                self._use()
+        elif weights is None:
+            rnd = self.generator.random
+            length = len(seq)
+            return [seq[int(rnd() * length)] for _ in range(num)]
+        return self.generator.choices(seq, weights, k=num)
+
+    def rndm_gauss_limit_n(self, param, num):
+        """
+        returns a list of num rndm_gauss_limit values
+        same values as num calls of rndm_gauss_limit
+        """
+        if self.compat and num > 0:
+            self._use()
+        if param[2] == param[3]:
+            return [param[2]] * num
+        if param[1] == 0:
+            return [param[0]] * num
+        gauss = self.generator.gauss
+        mean, delta, lower, upper = param
+        values = []
+        while len(values) < num:
+            value = gauss(mean, delta)
+            if lower <= value <= upper:
+                values.append(value)
+        return values
+
+    def rndm_shuffle(self, seq):
+        """
+        replaces standard shuffle function
+        """
+        if self.compat:
+            self.legacy_state.get_generator(self).shuffle(seq)
+        else:
+            self.generator.shuffle(seq)
+
+
+# entries of BarsAndBeats, the first field is the record type (FIRST_BAR_OF_PART, BEAT_RHYTHM or BEAT_MELODY)
+FirstBarOfPart = collections.namedtuple('FirstBarOfPart', ['record_type', 'first_bar'])
+BeatRhythm = collections.namedtuple('BeatRhythm', ['record_type', 'beat_indx', 'rhythm'])
+BeatMelody = collections.namedtuple('BeatMelody', ['record_type', 'beat_indx', 'melody_rule', 'melody'])
+
+
+class BarsAndBeats():
+    """
+    Holds the bars and beats entries of one track:
+
+    FirstBarOfPart(FIRST_BAR_OF_PART, first bar number)
+    BeatRhythm(BEAT_RHYTHM, beat_indx, rhythm)
+    BeatMelody(BEAT_MELODY, beat_indx, melody rule, melody)
+
+    Beat entries are found by the first bar of a part and the beat index counted from there.
+    The positions of the beat entries are indexed while they are appended, so no search
+    from the start of the entries is needed.
+    Entries are not changed after they are appended (except the used tones of the harmony track, which are
+    stored as its melody), so repeated beats share rhythm, rule and tones of the original entry instead of copies.
+    """
+    def __init__(self):
+        self.entries = []
+        self.positions = {const.BEAT_RHYTHM: [], const.BEAT_MELODY: []}  # entry positions of each record type
+        self.first_bars = {const.BEAT_RHYTHM: [], const.BEAT_MELODY: []}  # first bar of part of each beat entry
+        self.part_starts = {}  # first bar of part: number of beat entries of each record type before the part
+        self.current_first_bar = None
+
+    def append(self, entry):
+        """appends an entry and adds it to the index"""
+        record_type = entry[0]
+        if record_type == const.FIRST_BAR_OF_PART:
+            self.current_first_bar = entry[1]
+            if entry[1] not in self.part_starts:
+                self.part_starts[entry[1]] = {key: len(val) for key, val in self.positions.items()}
+        else:
+            self.positions[record_type].append(len(self.entries))
+            self.first_bars[record_type].append(self.current_first_bar)
+        self.entries.append(entry)
+
+    def get_beat(self, record_type, start_from_bar, beat_indx):
+        """
+        returns the entry of record_type for the beat beat_indx counted from the part starting with
+        bar start_from_bar, and the first bar of the part the entry belongs to
+        """
+        assert start_from_bar in self.part_starts, "part not found in bars and beats"
+        indx = self.part_starts[start_from_bar][record_type] + beat_indx
+        assert 0 <= indx < len(self.positions[record_type]), "beat not found in bars and beats"
+        return self.entries[self.positions[record_type][indx]], self.first_bars[record_type][indx]
+
+    def get_last(self, record_type):
+        """returns the last entry of record_type, None if there is none"""
+        if not self.positions[record_type]:
+            return None
+        return self.entries[self.positions[record_type][-1]]
+
+    def get_nth_last(self, record_type, n_from_end):
+        """returns the n_from_end last entry of record_type (1 = last), None if there is none"""
+        if n_from_end > len(self.positions[record_type]):
+            return None
+        return self.entries[self.positions[record_type][-n_from_end]]
+
+
+class ComposedTrack():
+    """
+    Holds the result of one composed track, one entry for each tone (or chord), in arrays of ints:
+    position (in ticks, humanized), intensity (MIDI volume) and connection type.
+    The tone heights of all chords are stored in one array, the chord of entry indx is
+    pitches[offsets[indx]:offsets[indx + 1]] (no tone heights for a pause or a percussion instrument).
+    """
+    def __init__(self):
+        self.positions = array.array('i')
+        self.intensities = array.array('i')
+        self.connection_types = array.array('i')
+        self.pitches = array.array('i')
+        self.offsets = array.array('i', [0])
+
+    def __len__(self):
+        """returns the number of chords"""
+        return len(self.offsets) - 1
+
+    def append_tones(self, tones):
+        """appends a chord (list of tone heights)"""
+        self.pitches.extend(tones)
+        self.offsets.append(len(self.pitches))
+
+    def get_tones(self, indx):
+        """returns the tone heights of entry indx"""
+        return self.pitches[self.offsets[indx]:self.offsets[indx + 1]]
+
+    def iter_tones(self):
+        """returns the tone heights of all entries, one after the other"""
+        pitches = self.pitches
+        offsets = self.offsets
+        for indx in range(len(offsets) - 1):
+            yield pitches[offsets[indx]:offsets[indx + 1]]
+
+
+class ToneScoringTables():
+    """
+    Lookup tables for the evaluation of candidate tones (check_tones) of one track.
+    The basic scale of the track is calculated once, all other tables are calculated on first use
+    and kept for the following beats:
+
+    disharmony values of the scale tones for each combination of harmony and used tones
+    weighted distance and anchor points of each pitch class for each disharmony values
+    weighted continuation points of each pitch class for each harmony and previous tone
+    weighted jump, second last tone and target points for each instrument type
+    """
+    def __init__(self, scale, basic_scale):
+        self.scale = scale
+        self.basic_scale = basic_scale
+        self.disharmony_values = {}  # (harmony, used tones): disharmony to harmony rule, disharmony to used tones
+        self.distance_points = {}  # (instrument type, harmony, used tones): points of each pitch class
+        self.cont_points = {}  # (instrument type, harmony, previous tone): points of each pitch class
+        self.tone_points = {}  # instrument type: jump, second last tone and target points
+
+    def get_distance_points(self, instrument_type, c_3):
+        """
+        returns the weighted product of distance and anchor points of each pitch class and whether
+        one of the points is 0, for the disharmony values of the current beat
+        """
+        key = (instrument_type,) + c_3['disharmony_key']
+        if key not in self.distance_points:
+            points = []
+            for pitch_class in range(12):
+                used_dist_points, harmony_dist_points = get_distance_points(pitch_class, instrument_type, c_3)
+
+                if self.scale[const.SCALE_NOTE_INDX] == pitch_class:
+                    anchor_points = mp.ANCHOR_POINTS
+                else:
+                    anchor_points = mp.NO_ANCHOR_POINTS
+                assert 0 <= anchor_points <= 10
+
+                # the order of the multiplications is the same as in check_tone
+                points.append([apply_weight(mp.W_USED_DIST[instrument_type], used_dist_points) *
+                               apply_weight(mp.W_HARMONY_DIST[instrument_type], harmony_dist_points) *
+                               apply_weight(mp.W_ANCHOR[instrument_type], anchor_points),
+                               0 in [used_dist_points, harmony_dist_points, anchor_points]])
+            self.distance_points[key] = points
+        return self.distance_points[key]
+
+    def get_cont_points(self, instrument_type, previous_tones, c_3):
+        """
+        returns the weighted continuation points (scale, harmony) of each pitch class and whether one of
+        the points is 0, for the current harmony and the previous tone
+        """
+        if previous_tones[0] == []:
+            previous_tone = None
+        elif len(previous_tones[0]) > 1:  # chord
+            previous_tone = -1
+        else:
+            previous_tone = previous_tones[0][0] % 12
+        key = (instrument_type, tuple(c_3['current_beat_harmony_rule'][0][1]), previous_tone)
+        if key not in self.cont_points:
+            points = []
+            for pitch_class in range(12):
+                cont_in_scale_points = get_cont_in_scale_points(pitch_class, previous_tones, c_3)
+                cont_in_harmony_points = get_cont_in_harmony_points(pitch_class, previous_tones, c_3)
+                assert 0 <= cont_in_scale_points <= 10
+                assert 0 <= cont_in_harmony_points <= 10
+
+                points.append([apply_weight(mp.W_CONT_IN_SCALE[instrument_type], cont_in_scale_points),
+                               apply_weight(mp.W_CONT_IN_HARMONY[instrument_type], cont_in_harmony_points),
+                               0 in [cont_in_scale_points, cont_in_harmony_points]])
+            self.cont_points[key] = points
+        return self.cont_points[key]
+
+    def get_tone_points(self, instrument_type):
+        """
+        returns the weighted points for jump height, second last tone difference and target tone distance,
+        None if the points are 0
+        """
+        if instrument_type not in self.tone_points:
+            def weighted(weights, points):
+                if points == 0:
+                    return None
+                return apply_weight(weights[instrument_type], points)
+
+            self.tone_points[instrument_type] = \
+                {'jump': [weighted(mp.W_JUMP, points) for points in mp.POINTS_JUMP_HEIGHT],
+                 'jump_no_prev': weighted(mp.W_JUMP, 10),
+                 'second_last': [apply_weight(mp.W_SECOND_LAST_TONE[instrument_type], points)
+                                 for points in mp.POINTS_SECOND_LAST_TONE],
+                 'second_last_default': apply_weight(mp.W_SECOND_LAST_TONE[instrument_type], 10),
+                 'target': [weighted(mp.W_TARGET, points) for points in mp.POINTS_TARGET_TONE],
+                 }
+        return self.tone_points[instrument_type]
 
 
 def show_composition_structure(comp_struct, level):
@@ -357,13 +637,14 @@ def get_distance_points(tone_abs_height, instrument_type, c_3):
     return used_dist_points, harmony_dist_points
 
 
+def apply_weight(weight, points):
+    """weight 0 gives 1.0, weight 1 gives points"""
+    return weight * (points - 1.0) + 1.0
+
+
 def check_tone(tone_abs_height, instrument_type, target_tone, previous_tones, c_3):
     """evaluates a tone"""
 
-    def apply_weight(weight, points):
-        """weight 0 gives 1.0, weight 1 gives points"""
-        return weight * (points - 1.0) + 1.0
-
     used_dist_points, harmony_dist_points = get_distance_points(tone_abs_height, instrument_type, c_3)
 
     # anchor tone, slightly prefer anchor tone, anchor_tone is c_3['scale'][const.SCALE_NOTE_INDX]
@@ -421,6 +702,61 @@ def check_tone(tone_abs_height, instrument_type, target_tone, previous_tones, c_
     return [tone_abs_height, final_points]
 
 
+def check_tones(low_tone, high_tone, instrument_type, target_tone, previous_tones, c_3):
+    """
+    evaluates all tones from low_tone to high_tone in one pass and returns the same results as check_tone
+    for each of them.
+    Distance, anchor and continuation points only depend on the pitch class of a tone and are taken
+    from the tables in c_3['scoring_tables'], jump, second last tone and target points are looked up
+    for each tone.
+    """
+    tables = c_3['scoring_tables']
+    distance_points = tables.get_distance_points(instrument_type, c_3)
+    cont_points = tables.get_cont_points(instrument_type, previous_tones, c_3)
+    tone_points = tables.get_tone_points(instrument_type)
+
+    # second last tone, only used if it is a single tone
+    second_last_tone = None
+    if previous_tones[0] != [] and previous_tones[1] != [] and len(previous_tones[1]) == 1:
+        second_last_tone = previous_tones[1][0]
+
+    results = []
+    for tone_abs_height in range(low_tone, high_tone + 1):
+        dist_anchor_weighted, dist_anchor_is_zero = distance_points[tone_abs_height % 12]
+        cont_in_scale_weighted, cont_in_harmony_weighted, cont_is_zero = cont_points[tone_abs_height % 12]
+
+        if previous_tones[0] == []:
+            jump_weighted = tone_points['jump_no_prev']
+        else:
+            smallest_jump_height = min(abs(tone - tone_abs_height) for tone in previous_tones[0])
+            if smallest_jump_height >= len(tone_points['jump']):
+                jump_weighted = None
+            else:
+                jump_weighted = tone_points['jump'][smallest_jump_height]
+
+        target_distance = abs(tone_abs_height - target_tone)
+        if target_distance >= len(tone_points['target']):
+            target_weighted = None
+        else:
+            target_weighted = tone_points['target'][target_distance]
+
+        if dist_anchor_is_zero or cont_is_zero or jump_weighted is None or target_weighted is None:
+            results.append([tone_abs_height, 0])
+            continue
+
+        if second_last_tone is None or abs(second_last_tone - tone_abs_height) >= len(tone_points['second_last']):
+            second_last_weighted = tone_points['second_last_default']
+        else:
+            second_last_weighted = tone_points['second_last'][abs(second_last_tone - tone_abs_height)]
+
+        # the order of the multiplications is the same as in check_tone
+        results.append([tone_abs_height,
+                        dist_anchor_weighted * jump_weighted * cont_in_scale_weighted * cont_in_harmony_weighted *
+                        second_last_weighted * target_weighted])
+
+    return results
+
+
 def sin_special(x_val):
     """this function differs from sine in that it generates more values in the range around 0 instead
     of extreme values near +1 and -1."""
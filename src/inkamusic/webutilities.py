@@ -10,15 +10,24 @@ This file contains webutility functions
 """
 
 import datetime
+import io
+import os
+import queue
 import string
+import time
 import random
 import cherrypy
+import inkamusic.basic_rhythms as basic_rhythms
+import inkamusic.basic_scales as basic_scales
 import inkamusic.html_data as html_data
+import inkamusic.cache as cache
 import inkamusic.const as const
 import inkamusic.utilities as utilities
 import inkamusic.create_composition as create_composition
+import inkamusic.jobs as jobs
+import inkamusic.metrics as metrics
+import inkamusic.profiling as profiling
 import inkamusic.settings as settings
-import inkamusic.general_midi_instruments as general_midi_instruments
 import inkamusic.menu_entries as me
 import inkamusic.music_parameter as mp
 
@@ -31,14 +40,8 @@ def check_instrumentation_ids(instrumentation):
             if len(idx) == 2:  # not a random type
                 assert (isinstance(idx[1], int) and 0 < idx[1] <= 100) \
                   or (isinstance(idx[1], list) and check_cr(idx[1]))
-                found = False
-                for gmi in general_midi_instruments.GM_INSTRUMENTS:
-                    if gmi[1] == idx[0]:
-                        found = True
-                        break
-
-                assert found, ("ID " + repr(idx) + " used in " +
-                               repr(instr) + " was not found in GM_INSTRUMENTS list")
+                assert idx[0] in settings.INSTRUMENTS_BY_ID, ("ID " + repr(idx) + " used in " +
+                                                              repr(instr) + " was not found in GM_INSTRUMENTS list")
 
     def check_cr(cr_list):
         for i in cr_list:
@@ -209,38 +212,46 @@ def get_random_seed():
     return random.randint(10000, const.MAX_SEED)
 
 
-def create_rndm_classes(seed_val, instru_id_val):
-    """creates independant random classes for different parts of the composition process"""
+def create_rndm_classes(seed_val, instru_id_val, compat=const.RNDM_COMPATIBILITY_MODE):
+    """creates independant random classes for different parts of the composition process
+       The global generator of the random module is not used. Each seed for the next random class is
+       drawn from a generator seeded with the previous seed, as in older versions"""
+
+    seed_generator = random.Random()
 
-    def get_rndm():
+    def get_rndm(seed):
         """creates random number used as seed for next random class"""
-        return random.randint(1, 1000000)
+        seed_generator.seed(seed)
+        return seed_generator.randint(1, 1000000)
+
+    legacy_state = utilities.RndmLegacyState()
+
+    def new_rndm(seed):
+        return utilities.Rndm(seed, compat=compat, legacy_state=legacy_state)
 
     rndm_class = [0 for i in range(const.NUM_RNDM_CLASSES)]
 
     # init seed objects
-    rnd_state = random.getstate()
-    rndm_class[const.RNDM_INSTRU] = utilities.Rndm(instru_id_val)
-    random.setstate(rnd_state)
-    rndm_class[const.RNDM_SCALE] = utilities.Rndm(seed_val)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_HARMO] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_MELO_RHYTHM] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_STRUCTURE] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_BASE_RHYTHM] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_SOLO_RHYTHM] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_PERC_RHYTHM] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_INSTRU_RHYTHM] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_HARMO_DISTRI] = utilities.Rndm(seed_val_next)
-    seed_val_next = get_rndm()
-    rndm_class[const.RNDM_OTHER] = utilities.Rndm(seed_val_next)
+    rndm_class[const.RNDM_INSTRU] = new_rndm(instru_id_val)
+    rndm_class[const.RNDM_SCALE] = new_rndm(seed_val)
+    seed_val_next = get_rndm(seed_val)
+    rndm_class[const.RNDM_HARMO] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_MELO_RHYTHM] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_STRUCTURE] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_BASE_RHYTHM] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_SOLO_RHYTHM] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_PERC_RHYTHM] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_INSTRU_RHYTHM] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_HARMO_DISTRI] = new_rndm(seed_val_next)
+    seed_val_next = get_rndm(seed_val_next)
+    rndm_class[const.RNDM_OTHER] = new_rndm(seed_val_next)
 
     return rndm_class
 
@@ -320,6 +331,91 @@ def get_menu_html():
     return html
 
 
+def prepare_composition(selections, seed_val, instru_id_val, random_file_name, progress=None):
+    """returns the InkaAlgorithmicMusic object for a composition using the selections of the web page"""
+
+    if const.DEBUG_OUTPUT:
+        print(' ')
+        print(' ')
+        print(' ***   START   ***')
+        print(' ')
+        print(' ')
+        print('seed is', seed_val, 'and instru_id is', instru_id_val)
+
+    # initialise random classes for different parts of the creation process
+    rndm_2 = create_rndm_classes(seed_val, instru_id_val)
+
+    # create settings object of this composition
+    menu_options = settings.Settings(selections)
+
+    # define other settings which are not available in web interface
+    # but are derived indirectly, typically using random numbers
+    menu_options.set_selected_bpm(rndm_2)
+
+    # create InkaAlgorithmicMusic object
+    return create_composition.InkaAlgorithmicMusic(menu_options=menu_options,
+                                                   rndm_2=rndm_2,
+                                                   random_file_name=random_file_name,
+                                                   progress=progress)
+
+
+def compose_midi(selections, seed_val, instru_id_val, random_file_name, progress=None, stats=None):
+    """creates a composition using the selections of the web page, returns the midi data.
+       If stats (dict) is given, seconds, seconds of each stage, tries of retry loops, number of notes
+       and bytes of midi data are added"""
+
+    current_composition = prepare_composition(selections, seed_val, instru_id_val, random_file_name,
+                                              progress=progress)
+
+    if stats is not None:
+        start = time.perf_counter()
+        stats['stages'] = {}
+
+        def stage_time(stage, seconds):
+            if stage[len('track_'):].isdigit():  # all instrument tracks (track_0, track_1, ...) are combined
+                stage = 'instrument_tracks'
+            stats['stages'][stage] = stats['stages'].get(stage, 0) + seconds
+
+        current_composition.inka_data['stage_time'] = stage_time
+
+    # create composition
+    midi_stream = io.BytesIO()
+    current_composition.create_composition(midi_stream)
+    midi_data = midi_stream.getvalue()
+
+    if stats is not None:
+        stats['seconds'] = time.perf_counter() - start
+        stats['try_counts'] = current_composition.inka_data_2['try_counts']
+        stats['notes'] = current_composition.inka_data_2['num_of_notes']
+        stats['bytes'] = len(midi_data)
+    return midi_data
+
+
+def init_compose_process():
+    """prepares a worker process of the process pool, so the first composition of the process does not wait:
+       the composition modules are imported with this module, when this function is passed to the new process,
+       the instrument catalog, basic scales and basic rhythms are used once"""
+    assert settings.INSTRUMENTS_BY_ID, "instrument catalog is empty"
+    basic_scales.BasicScale()
+    basic_rhythms.BasicRhythm()
+
+
+def run_compose_midi(profile_info, *args, **kwargs):
+    """calls compose_midi, with profiler if profile_info is given
+       (dict with file_name of profiling files and information stored with the profile)"""
+    if profile_info is None:
+        return compose_midi(*args, **kwargs)
+    return profiling.run_profiled(profile_info['file_name'], profile_info, compose_midi, *args, **kwargs)
+
+
+def compose_in_process(selections, seed_val, instru_id_val, random_file_name, collect_stats=False,
+                       profile_info=None):
+    """creates a composition in a worker process of the process pool, returns the midi data
+       and the statistics of compose_midi (None if collect_stats is False)"""
+    stats = {} if collect_stats else None
+    return run_compose_midi(profile_info, selections, seed_val, instru_id_val, random_file_name, stats=stats), stats
+
+
 # pylint: disable=locally-disabled, no-self-use
 
 class InkaAlgorithmicMusicWebInterface():
@@ -327,10 +423,27 @@ class InkaAlgorithmicMusicWebInterface():
         which generates and handles the web interface.
     """
 
-    def __init__(self):
+    def __init__(self, num_of_processes=0, cache_dir=None):
+
+        # durations of the composition stages etc., served by metrics
+        self.composition_metrics = metrics.Metrics() if const.METRICS_ENABLED else None
+
+        # files of profiled compositions
+        self.profile_dir = os.path.dirname(const.__file__) + '/' + const.PROFILE_DIR
 
-        # create settings object
-        self.menu_options = settings.Settings()
+        # cache for the midi data of compositions
+        if cache_dir is None:
+            cache_dir = os.path.dirname(const.__file__) + '/' + const.CACHE_DIR
+        self.cache = cache.CompositionCache(const.CACHE_MEMORY_BYTES, cache_dir, const.CACHE_DISK_BYTES)
+
+        if num_of_processes:
+            # compositions are created by worker processes, one worker thread waits for each process
+            self.process_pool = jobs.ProcessPool(num_of_processes, initializer=init_compose_process)
+            self.job_queue = jobs.JobQueue(num_of_processes, const.JOB_QUEUE_DEPTH, const.JOB_MAX_FINISHED)
+        else:
+            # compositions are created by the worker threads of the job queue
+            self.process_pool = None
+            self.job_queue = jobs.JobQueue(const.JOB_WORKERS, const.JOB_QUEUE_DEPTH, const.JOB_MAX_FINISHED)
 
         # check consistency of entries in settings module.
         check_instrumentation_ids(me.INSTRUMENTATION_LIST)
@@ -360,7 +473,9 @@ class InkaAlgorithmicMusicWebInterface():
 
     @cherrypy.expose
     def generate(self, **kwargs):
-        """This function uses the web page settings to generate a composition"""
+        """This function uses the web page settings to add a composition job to the job queue.
+           Returns the file name of the composition, which is also the job id, followed by the
+           seed and instrumentation ID actually used"""
 
         # check if user seed is checked in web interface and set seed_val
         if 'seed_check' in kwargs:  # user seed checked
@@ -390,31 +505,7 @@ class InkaAlgorithmicMusicWebInterface():
         else:
             instru_id_val = get_random_seed()
 
-        # initialize random value generation with seed_val
-
-        random.seed(a=seed_val)
-        if const.DEBUG_OUTPUT:
-            print(' ')
-            print(' ')
-            print(' ***   START   ***')
-            print(' ')
-            print(' ')
-            print('seed is', seed_val, 'and instru_id is', instru_id_val)
-
-        # initialise random classes for different parts of the creation process
-        rndm_2 = create_rndm_classes(seed_val, instru_id_val)
-
-        # reset all settings
-        self.menu_options.reset()
-
-        # set all selections from web interface
-        self.menu_options.set_web_interface_selections(kwargs)
-
-        # define other settings which are not available in web interface
-        # but are derived indirectly, typically using random numbers
-        self.menu_options.set_selected_bpm(rndm_2)
-
-        # create filename for composition
+        # create filename for composition, also used as job id
         random_file_name = create_filename()
 
         try:
@@ -424,14 +515,97 @@ class InkaAlgorithmicMusicWebInterface():
         except AttributeError:
             pass
 
-        # create InkaAlgorithmicMusic object
-        current_composition = create_composition.InkaAlgorithmicMusic(menu_options=self.menu_options,
-                                                                      rndm_2=rndm_2,
-                                                                      random_file_name=random_file_name)
-
-        # create composition
-        current_composition.create_composition()
+        try:
+            selections = settings.parse_web_selections(kwargs)
+        except (KeyError, IndexError):
+            raise cherrypy.HTTPError(400, 'Unknown menu selection.')
+
+        # profile composition, if requested (and allowed) or sampled
+        profile_info = None
+        if (const.PROFILE_REQUESTS and 'profile' in kwargs) or random.uniform(0, 100) < const.PROFILE_SAMPLE_PERCENT:
+            profile_info = {'file_name': self.profile_dir + random_file_name,
+                            'seed_val': seed_val,
+                            'instru_id_val': instru_id_val,
+                            'web_settings': {key: value for key, value in kwargs.items() if key.startswith('sel_')},
+                            }
+
+        # a composition with the same selections, seed and instrumentation ID may be cached,
+        # a profiled composition is always created
+        midi_data = None
+        if profile_info is None:
+            midi_data = self.cache.get(cache.get_cache_key(selections, seed_val, instru_id_val))
+        try:
+            if midi_data is not None:
+                self.job_queue.add_finished(random_file_name, midi_data)
+            else:
+                self.job_queue.submit(random_file_name, self.compose, selections, seed_val, instru_id_val,
+                                      random_file_name, profile_info)
+        except queue.Full:
+            raise cherrypy.HTTPError(429, 'Too many compositions are waiting, please try again later.')
 
-        # return name of generated file and actually used seed_val to web interface
+        # return name of generated file (job id) and actually used seed_val to web interface
         xxd = random_file_name + str(seed_val).zfill(9) + str(instru_id_val).zfill(9)
         return xxd
+
+    def compose(self, selections, seed_val, instru_id_val, random_file_name, profile_info=None, progress=None):
+        """creates a composition, called by a worker thread of the job queue, returns the midi data.
+           The composition is profiled if profile_info is given (see run_compose_midi)"""
+
+        stats = {} if self.composition_metrics is not None else None
+        try:
+            if self.process_pool is not None:
+                # the worker thread waits for a worker process, progress is not reported
+                midi_data, stats = self.process_pool.run(compose_in_process, selections, seed_val, instru_id_val,
+                                                         random_file_name, stats is not None, profile_info)
+            else:
+                midi_data = run_compose_midi(profile_info, selections, seed_val, instru_id_val, random_file_name,
+                                             progress=progress, stats=stats)
+        except Exception:
+            if self.composition_metrics is not None:
+                self.composition_metrics.increment('inkamusic_compositions_total', result='failed')
+            raise
+
+        if self.composition_metrics is not None:
+            self.composition_metrics.increment('inkamusic_compositions_total', result='done')
+            self.composition_metrics.observe_composition(stats)
+
+        self.cache.put(cache.get_cache_key(selections, seed_val, instru_id_val), midi_data)
+        return midi_data
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def status(self, job_id):
+        """returns state ('queued', 'running', 'done' or 'failed'), progress and position in queue of a job"""
+        status = self.job_queue.get_status(job_id)
+        if status is None:
+            raise cherrypy.HTTPError(404, 'Unknown job id.')
+        status['queue_depth'] = self.job_queue.get_queue_depth()
+        return status
+
+    @cherrypy.expose
+    @cherrypy.tools.json_out()
+    def cache_status(self):
+        """returns hit and miss counters and size of the composition cache"""
+        return self.cache.get_status()
+
+    @cherrypy.expose
+    def metrics(self):
+        """returns the metrics of all compositions in Prometheus text format"""
+        if self.composition_metrics is None:
+            raise cherrypy.HTTPError(404, 'Metrics are disabled.')
+        self.composition_metrics.set('inkamusic_job_queue_depth', self.job_queue.get_queue_depth())
+        cache_status = self.cache.get_status()
+        for result in ['memory_hits', 'disk_hits', 'misses']:
+            self.composition_metrics.set('inkamusic_cache_requests_total', cache_status[result], result=result)
+        cherrypy.response.headers['Content-Type'] = 'text/plain; version=0.0.4; charset=utf-8'
+        return self.composition_metrics.get_text()
+
+    @cherrypy.expose
+    def result(self, job_id):
+        """returns the midi file created by a job"""
+        midi_data = self.job_queue.get_result(job_id)
+        if midi_data is None:
+            raise cherrypy.HTTPError(404, 'Unknown or unfinished job id.')
+        cherrypy.response.headers['Content-Type'] = 'audio/midi'
+        cherrypy.response.headers['Content-Disposition'] = 'attachment; filename="' + job_id + '.mid"'
+        return midi_data
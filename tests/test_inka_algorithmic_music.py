@@ -3,15 +3,391 @@
 
 """Tests for `inkamusic` package."""
 
+import io
+import json
+import os
+import pstats
+import queue
+import random
+import threading
+import time
 import pytest
 import inkamusic.webutilities as webutilities
+import inkamusic.const as const
+import inkamusic.create_composition as create_composition
+import inkamusic.batch as batch
+import inkamusic.cache as cache
+import inkamusic.jobs as jobs
+import inkamusic.metrics as metrics
+import inkamusic.midiutil as midiutil
+import inkamusic.profiling as profiling
+import inkamusic.settings as settings
+import inkamusic.utilities as utilities
+import inkamusic.algorithms as algorithms
+import inkamusic.music_parameter as mp
+import inkamusic.basic_rhythms as basic_rhythms
+import inkamusic.rhythm_algorithms as rhythm_algorithms
+import inkamusic.general_midi_instruments as general_midi_instruments
 
-def test_generate_midi():
-    x = webutilities.InkaAlgorithmicMusicWebInterface()
-    x.generate(sel_instrumentation='Piano + Bass',sel_percussion='Add percussion', sel_scales='6 tone (maj min)',
-    sel_rhythms='Soca', sel_lengthmin='0 min',sel_lengthsec='10 s', sel_speed='normal speed', seed_val = 33016197,
-    instru_id_val = 79586706)
+WEB_SETTINGS = {'sel_instrumentation': 'Piano + Bass', 'sel_percussion': 'Add percussion',
+                'sel_scales': '6 tone (maj min)', 'sel_rhythms': 'Soca', 'sel_lengthmin': '0 min',
+                'sel_lengthsec': '10 s', 'sel_speed': 'normal speed'}
 
-    x.generate(sel_instrumentation='Marimba + Bass',sel_percussion='Add percussion', sel_scales='C (maj)',
-    sel_rhythms='Soca', sel_lengthmin='2 min',sel_lengthsec='10 s', sel_speed='normal speed')
 
+def test_generate_midi(tmp_path):
+    x = webutilities.InkaAlgorithmicMusicWebInterface(cache_dir=str(tmp_path))
+    job_1 = x.generate(sel_instrumentation='Piano + Bass',sel_percussion='Add percussion', sel_scales='6 tone (maj min)',
+    sel_rhythms='Soca', sel_lengthmin='0 min',sel_lengthsec='10 s', sel_speed='normal speed', seed_check='1',
+    seed_val = 33016197, instru_id_check='1', instru_id_val = 79586706)[:23]
+
+    job_2 = x.generate(sel_instrumentation='Marimba + Bass',sel_percussion='Add percussion', sel_scales='C (maj)',
+    sel_rhythms='Soca', sel_lengthmin='2 min',sel_lengthsec='10 s', sel_speed='normal speed', seed_check='1',
+    seed_val = 1234567, instru_id_check='1', instru_id_val = 7654321)[:23]
+
+    for job_id in (job_1, job_2):
+        assert x.job_queue.wait(job_id, timeout=60)
+        assert x.status(job_id)['state'] == 'done', x.status(job_id)['error']
+        assert x.result(job_id)[:4] == b'MThd'
+
+
+
+def test_rndm_compatibility():
+    rndm = utilities.Rndm(4711)
+    random.seed(4711)
+    assert [rndm.rndm_int(1, 100) for _ in range(100)] == [random.randint(1, 100) for _ in range(100)]
+    assert rndm.rndm_gauss_limit([0, 1, -1, 1]) == gauss_limit_reference([0, 1, -1, 1])
+
+
+def test_rndm_batch():
+    rndm, rndm_batch = utilities.Rndm(4711), utilities.Rndm(4711)
+    assert rndm_batch.rndm_int_n(1, 100, 50) == [rndm.rndm_int(1, 100) for _ in range(50)]
+    assert rndm_batch.rndm_gauss_limit_n([0, 1, -1, 1], 50) == [rndm.rndm_gauss_limit([0, 1, -1, 1]) for _ in range(50)]
+    assert rndm_batch.rndm_choice_n([1, 2, 3], [5, 0, 2], 50) == \
+        [rndm.rndm_choice([1, 2, 3], [5, 0, 2]) for _ in range(50)]
+
+
+def gauss_limit_reference(param):
+    value = random.gauss(param[0], param[1])
+    while not param[2] <= value <= param[3]:
+        value = random.gauss(param[0], param[1])
+    return value
+
+
+def test_bars_and_beats_index():
+    bars_and_beats = utilities.BarsAndBeats()
+    for first_bar in (1, 3):
+        bars_and_beats.append(utilities.FirstBarOfPart(const.FIRST_BAR_OF_PART, first_bar))
+        for beat_indx in range(8):
+            bars_and_beats.append(utilities.BeatRhythm(const.BEAT_RHYTHM, beat_indx, [[beat_indx * 720, 2, 80]]))
+            bars_and_beats.append(utilities.BeatMelody(const.BEAT_MELODY, beat_indx, [first_bar], [60 + beat_indx]))
+    assert bars_and_beats.get_beat(const.BEAT_MELODY, 1, 2)[0] == (const.BEAT_MELODY, 2, [1], [62])
+    assert bars_and_beats.get_beat(const.BEAT_MELODY, 1, 9) == ((const.BEAT_MELODY, 1, [3], [61]), 3)
+    assert bars_and_beats.get_beat(const.BEAT_RHYTHM, 3, 7)[0].rhythm == [[7 * 720, 2, 80]]
+    assert bars_and_beats.get_last(const.BEAT_MELODY).melody == [67]
+
+
+def test_pitch_class_timeline():
+    tones = [[60], [], [62, 66], [61], [72, 76], [67]]
+    for pos in ([0, 720, 1440, 2160, 2880, 3600], [0, 720, 1500, 1440, 2880, 3600]):
+        timeline = create_composition.PitchClassTimeline(pos, tones)
+        for pos_current_tone in (-1, 0, 700, 1440, 3600):
+            for current_tone in ([60], [65, 71], [], [48, 55]):
+                expected = next((p - pos_current_tone for p, tone in zip(pos, tones) if p > pos_current_tone
+                                 and any((z_1 - z_2) % 12 in [1, 11] for z_1 in current_tone for z_2 in tone)), -1)
+                assert timeline.find_first_dissonance(pos_current_tone, current_tone) == expected
+
+
+def test_check_tones():
+    c_3 = {'scale': [7, 65, 0, 2, [1, 0, 2]],
+           'basic_scale': [0, 1, 1, 0, 1, 0, 1, 1, 0, 1, 0, 1],
+           'current_beat_harmony_rule': [[9, [2, 6, 9], 0]],
+           'disharmony_to_harmony_rule': [999, 10, 0, 999, 1, 999, 0, 10, 999, 0, 999, 1],
+           'disharmony_to_used_tones': [999, 0, 1, 999, 0, 999, 2, 0, 999, 10, 999, 0],
+           'disharmony_key': ((2, 6, 9), (1, 7))}
+    c_3['scoring_tables'] = utilities.ToneScoringTables(c_3['scale'], c_3['basic_scale'])
+    for instrument_type in (const.T_BASS, const.T_SOLO):
+        for previous_tones in ([[], []], [[62], []], [[66], [69]], [[62, 66], [64]], [[71], [62, 69]]):
+            for target_tone in (40, 62, 75):
+                expected = [utilities.check_tone(tone, instrument_type, target_tone, previous_tones, c_3)
+                            for tone in range(target_tone - 9, target_tone + 10)]
+                assert utilities.check_tones(target_tone - 9, target_tone + 9, instrument_type, target_tone,
+                                             previous_tones, c_3) == expected
+
+
+def test_midi_varlen():
+    assert midiutil.write_varlen(0) == b'\x00'
+    assert midiutil.write_varlen(0x7F) == b'\x7F'
+    assert midiutil.write_varlen(0x80) == b'\x81\x00'
+    assert midiutil.write_varlen(0x3FFF) == b'\xFF\x7F'
+    assert midiutil.write_varlen(0x4000) == b'\x81\x80\x00'
+    assert midiutil.write_varlen(0x0FFFFFFF) == b'\xFF\xFF\xFF\x7F'
+    track = midiutil.MidiTrackBuffer()
+    midiutil.note_on_event(track, tick=0x4000, channel=1, pitch=60, velocity=100)
+    midiutil.note_off_event(track, tick=0x80, channel=1, pitch=60)
+    midiutil.note_off_event(track, tick=0, channel=1, pitch=62)
+    midiutil.end_of_track_event(track)
+    assert midiutil.encode_track(track) == b'\x81\x80\x00\x91\x3C\x64\x81\x00\x81\x3C\x00\x00\x3E\x00\x01\xFF\x2F\x00'
+
+
+def test_midi_output(tmp_path):
+    pattern = [midiutil.MidiTrackBuffer(), midiutil.MidiTrackBuffer()]
+    for channel, track in enumerate(pattern):
+        midiutil.set_tempo_event(track, bpm=100)
+        midiutil.note_on_event(track, tick=0, channel=channel, pitch=60, velocity=90)
+        midiutil.note_off_event(track, tick=720, channel=channel, pitch=60)
+        midiutil.end_of_track_event(track)
+    midiutil.write_midifile(str(tmp_path / 'test.mid'), pattern)
+    assert midiutil.encode_midi(pattern) == (tmp_path / 'test.mid').read_bytes()
+    assert midiutil.encode_midi(pattern)[:4] == b'MThd'
+
+
+def test_job_queue(monkeypatch):
+    logged = []
+    monkeypatch.setattr(jobs.cherrypy, 'log', lambda msg, **kwargs: logged.append((msg, kwargs.get('traceback'))))
+    waiting = jobs.JobQueue(num_of_workers=0, max_queue_depth=1, max_finished_jobs=10)
+    waiting.submit('a', max, 1, 2)
+    with pytest.raises(queue.Full):
+        waiting.submit('b', max, 1, 2)
+    assert waiting.get_status('a')['state'] == jobs.JOB_QUEUED
+    assert waiting.get_status('b') is None
+
+    def add(val_1, val_2, progress):
+        progress(0.5)
+        return val_1 + val_2
+
+    job_queue = jobs.JobQueue(num_of_workers=2, max_queue_depth=10, max_finished_jobs=1)
+    job_queue.submit('add', add, 1, 2)
+    job_queue.submit('fail', add, 1, 'x')
+    assert job_queue.wait('add', timeout=10) and job_queue.wait('fail', timeout=10)
+    assert job_queue.get_result('fail') is None
+    assert job_queue.get_status('fail') is None or job_queue.get_status('fail')['state'] == jobs.JOB_FAILED
+    assert logged == [("job 'fail' failed", True)]
+
+
+def test_process_pool(tmp_path):
+    selections = settings.parse_web_selections(WEB_SETTINGS)
+    x = webutilities.InkaAlgorithmicMusicWebInterface(num_of_processes=2, cache_dir=str(tmp_path))
+    x.job_queue.submit('process', x.compose, selections, 33016197, 79586706, 'process')
+    assert x.job_queue.wait('process', timeout=60)
+    x.process_pool.shutdown()
+    assert x.job_queue.get_result('process') == webutilities.compose_midi(selections, 33016197, 79586706, 'thread')
+
+
+def test_concurrent_compositions():
+    selections = settings.parse_web_selections(dict(WEB_SETTINGS, sel_scales='A melodic (min maj)'))
+    job_queue = jobs.JobQueue(num_of_workers=4, max_queue_depth=10, max_finished_jobs=10)
+    for job_id in range(4):
+        job_queue.submit(job_id, webutilities.compose_midi, selections, 424242 + job_id % 2, 515151, str(job_id))
+    results = [job_queue.get_result(job_id) for job_id in range(4) if job_queue.wait(job_id, timeout=60)]
+    assert results[0] == results[2] != results[1] == results[3]
+    assert selections.scale == settings.get_scale('A melodic (min maj)')  # wildcards are replaced in a copy
+
+
+def test_composition_cache(tmp_path):
+    memory = cache.MemoryCache(max_bytes=10)
+    for key in 'abc':
+        memory.put(key, b'1234')
+    assert memory.get('a') is None and memory.get('b') == b'1234' and memory.num_of_bytes == 8
+    memory.put('d', b'1234')
+    assert memory.get('c') is None and memory.get('b') == b'1234'
+
+    disk = cache.DiskCache(str(tmp_path), max_bytes=10)
+    for key in 'abc':
+        disk.put(key, b'1234')
+    now = time.time()
+    for age, key in ((20, 'b'), (10, 'c')):  # c was added last
+        os.utime(disk.get_file_name(key), (now - age, now - age))
+    assert disk.get('a') is None and disk.get('b') == b'1234'
+    assert cache.DiskCache(str(tmp_path), max_bytes=4).entries == {'b': 4}  # c is removed, b was used last
+
+    # memory hits do not wait for a slow disk
+    composition_cache = cache.CompositionCache(100, str(tmp_path / 'slow'), 100)
+    composition_cache.put('a', b'1234')
+    disk_put, write_started, write_finish = composition_cache.disk.put, threading.Event(), threading.Event()
+    released = []
+
+    def slow_disk_put(key, data):
+        write_started.set()
+        released.append(write_finish.wait(5))  # False if the memory hit waited for the disk write
+        disk_put(key, data)
+
+    composition_cache.disk.put = slow_disk_put
+    writer = threading.Thread(target=composition_cache.put, args=('b', b'5678'))
+    writer.start()
+    assert write_started.wait(10)
+    assert composition_cache.get('a') == b'1234' and composition_cache.get('b') == b'5678'
+    write_finish.set()
+    writer.join()
+    assert released == [True] and composition_cache.disk.get('b') == b'5678' and composition_cache.get_status()['disk_entries'] == 2
+
+    x = webutilities.InkaAlgorithmicMusicWebInterface(cache_dir=str(tmp_path))
+    web_settings = dict(WEB_SETTINGS, seed_check='1', seed_val='33016197', instru_id_check='1',
+                        instru_id_val='79586706')
+    job_1 = x.generate(**web_settings)[:23]
+    assert x.job_queue.wait(job_1, timeout=60)
+    midi_data = x.result(job_1)
+    job_2 = x.generate(**web_settings)[:23]
+    assert x.status(job_2)['state'] == 'done' and x.result(job_2) == midi_data
+    assert x.cache_status()['misses'] == 1 and x.cache_status()['memory_hits'] == 1
+
+    x = webutilities.InkaAlgorithmicMusicWebInterface(cache_dir=str(tmp_path))
+    job_3 = x.generate(**web_settings)[:23]
+    assert x.result(job_3) == midi_data and x.cache_status()['disk_hits'] == 1
+
+
+def test_batch(tmp_path):
+    manifest = tmp_path / 'manifest.csv'
+    manifest.write_text('seed,instru_id,sel_lengthmin,sel_lengthsec\n33016197,79586706,0 min,10 s\n'
+                        '424242,,0 min,5 s\n33016197,79586706,0 min,10 s\n')
+    output = tmp_path / 'output'
+    batch.main(['--manifest', str(manifest), '--workers', '0', '--output', str(output)])
+    index = [json.loads(line) for line in (output / batch.INDEX_FILE).read_text().splitlines()]
+    assert [(record['seed'], record['instru_id']) for record in index] == [(33016197, 79586706), (424242, 424242)]
+    assert (output / index[0]['file']).read_bytes()[:4] == b'MThd' and index[0]['bars'] > 0
+
+    # finished compositions are skipped
+    batch.main(['--seeds', '424241-424242', '--length-min', '0 min', '--length-sec', '5 s', '--workers', '0',
+                '--output', str(output)])
+    index = [json.loads(line) for line in (output / batch.INDEX_FILE).read_text().splitlines()]
+    assert [record['seed'] for record in index] == [33016197, 424242, 424241]
+
+    # failed compositions and missing midi files are created again, invalid manifest entries are skipped
+    with open(output / batch.INDEX_FILE, 'a', encoding='utf-8') as index_file:
+        index_file.write(json.dumps({'file': '1_1_failed.mid', 'error': 'AssertionError()'}) + '\n{}\n')
+    assert batch.read_index(str(output)) == {record['file'] for record in index}
+    (output / index[0]['file']).unlink()
+    manifest.write_text('seed,instru_id,sel_lengthmin,sel_lengthsec,sel_speed\n33016197,79586706,0 min,10 s,\n'
+                        'no seed,,0 min,10 s,\n424242,,0 min,5 s,unknown speed\n')
+    batch.main(['--manifest', str(manifest), '--workers', '0', '--output', str(output)])
+    index = [json.loads(line) for line in (output / batch.INDEX_FILE).read_text().splitlines()]
+    assert [record.get('seed') for record in index] == [33016197, 424242, 424241, None, None, 33016197]
+
+
+def test_stage_time():
+    stages = []
+    composition = webutilities.prepare_composition(settings.parse_web_selections(WEB_SETTINGS), 33016197, 79586706,
+                                                   'stages')
+    composition.inka_data['stage_time'] = lambda stage, seconds: stages.append(stage)
+    composition.create_composition(io.BytesIO())
+    num_of_tracks = len(composition.inka_data_2['track_info'])
+    assert stages == ['global_rhythm', 'prepare_track_info', 'composition_structure', 'bar_distribution',
+                      'track_rhythms', 'harmony_track'] + ['track_' + str(i) for i in range(num_of_tracks)] + \
+                     ['create_midi']
+
+
+def test_metrics(tmp_path):
+    histogram = metrics.Histogram([1, 10])
+    for value in (0.5, 1, 5, 50):
+        histogram.observe(value)
+    assert histogram.get_lines('x', (('a', 'b'),)) == ['x_bucket{a="b",le="1"} 2', 'x_bucket{a="b",le="10"} 3',
+                                                       'x_bucket{a="b",le="+Inf"} 4', 'x_sum{a="b"} 56.5',
+                                                       'x_count{a="b"} 4']
+
+    x = webutilities.InkaAlgorithmicMusicWebInterface(cache_dir=str(tmp_path))
+    job_id = x.generate(**dict(WEB_SETTINGS, seed_check='1', seed_val='33016197', instru_id_check='1',
+                               instru_id_val='79586706'))[:23]
+    assert x.job_queue.wait(job_id, timeout=60)
+    text = x.metrics()
+    assert 'inkamusic_compositions_total{result="done"} 1' in text
+    assert 'inkamusic_stage_seconds_count{stage="track_rhythms"} 1' in text
+    assert 'inkamusic_stage_seconds_count{stage="instrument_tracks"} 1' in text
+    assert 'inkamusic_tries_count{loop="global_rhythm"} 1' in text
+    assert 'inkamusic_midi_bytes_sum ' + str(len(x.result(job_id))) in text
+    assert 'inkamusic_cache_requests_total{result="misses"} 1' in text
+
+
+def test_profiling(tmp_path, monkeypatch):
+    monkeypatch.setattr(const, 'PROFILE_REQUESTS', True)
+    x = webutilities.InkaAlgorithmicMusicWebInterface(cache_dir=str(tmp_path))
+    x.profile_dir = str(tmp_path / 'profiles') + '/'
+    job_id = x.generate(**dict(WEB_SETTINGS, sel_lengthmin='1 min', seed_check='1', seed_val='33016197',
+                               instru_id_check='1', instru_id_val='79586706', profile='1'))[:23]
+    assert x.job_queue.wait(job_id, timeout=60) and x.result(job_id)[:4] == b'MThd'
+
+    profile = str(tmp_path / 'profiles' / job_id)
+    assert 'create_composition' in [function for _, _, function in pstats.Stats(profile + '.pstats').stats]
+    with open(profile + '.collapsed.txt', encoding='utf-8') as collapsed_file:
+        assert 'create_composition.py:create_composition;' in collapsed_file.read()
+    with open(profile + '.json', encoding='utf-8') as info_file:
+        info = json.load(info_file)
+    assert info['seed_val'] == 33016197 and info['web_settings']['sel_lengthmin'] == '1 min' and info['samples'] > 0
+
+    # only one profiled call at a time
+    assert profiling.run_profiled(str(tmp_path / 'locked'), {}, profiling.PROFILE_LOCK.locked)
+    assert not profiling.PROFILE_LOCK.locked()
+
+
+def test_global_rhythm_tries():
+    selected_rhythm = basic_rhythms.BasicRhythm().get_basic_rhythm_by_id(12)  # 4/4 swing, blocked positions
+    blocked_positions = rhythm_algorithms.get_blocked_positions(selected_rhythm)
+    assert blocked_positions
+    tries = {True: [], False: []}
+    for compat in tries:
+        for seed in range(1, 11):
+            try_counts = {}
+            global_rhythm, _ = rhythm_algorithms.create_global_rhythm(
+                selected_rhythm, selected_rhythm[0], const.TICKSRES // 6,
+                webutilities.create_rndm_classes(seed, seed, compat), try_counts=try_counts)
+            assert not blocked_positions & {pos for pos, _ in global_rhythm[1]}
+            tries[compat].append(try_counts['global_rhythm'])
+    # in compatibility mode the subdivisions are the same as in older versions, which often need several tries
+    assert max(tries[True]) > 1 and tries[False] == [1] * 10
+
+
+def test_position_remover():
+    pattern = [[0, 5], [120, 0], [360, 2], [720, 4], [840, 1], [1080, 2], [1440, 4], [1560, 0], [1800, 2], [2160, 4],
+               [2400, 1], [2640, 0]]
+    for crit_time_diff in (0, 120, 240):
+        incremental = [4, [list(entry) for entry in pattern]]
+        recalculated = [4, [list(entry) for entry in pattern]]
+        position_remover = rhythm_algorithms.PositionRemover(incremental, 5, webutilities.create_rndm_classes(1, 1))
+        rndm_2 = webutilities.create_rndm_classes(1, 1)
+        while incremental[1]:
+            position_remover.remove_one(crit_time_diff)
+            rhythm_algorithms.remove_one(recalculated, 5, crit_time_diff, rndm_2)
+            assert incremental == recalculated
+
+
+def test_composed_track():
+    composed_track = utilities.ComposedTrack()
+    chords = [[60], [], [62, 66, 69], [48]]
+    for chord in chords:
+        composed_track.append_tones(chord)
+    assert len(composed_track) == 4 and list(composed_track.offsets) == [0, 1, 1, 4, 5]
+    assert [list(tones) for tones in composed_track.iter_tones()] == chords
+    assert list(composed_track.get_tones(2)) == [62, 66, 69] and not composed_track.get_tones(1)
+
+
+def test_humanize_and_volumes():
+    humanize_max_in_ticks = 20
+    positions = [50, 100, 130, 200, 300, 400]
+    humanize_values = [10, 15, -5, -60, 5, 30]
+    # 130 - 5 is too near to 115, 200 - 60 to 130 and 400 + 30 reaches the end of the part, so they are not shifted
+    assert algorithms.get_humanized_positions(positions, humanize_values, humanize_max_in_ticks, 420) == \
+        [60, 115, 130, 200, 305, 400]
+    assert algorithms.get_humanized_positions(positions, humanize_values, humanize_max_in_ticks, 500)[-1] == 430
+
+    for is_solo, volume_level in ((True, mp.VOLUME_LEVEL_SOLO), (False, mp.VOLUME_LEVEL_NON_SOLO)):
+        volume_table = algorithms.get_volume_table(is_solo)
+        assert len(volume_table) == algorithms.MAX_INTENSITY + 1
+        assert volume_table[0] == int(volume_level - 3 * mp.SPREAD / 5 + 0.5)
+        assert volume_table[5] == int(volume_level + 2 * mp.SPREAD / 5 + 0.5)
+
+
+def test_instrument_catalog():
+    assert len(settings.INSTRUMENTS) == len(general_midi_instruments.GM_INSTRUMENTS)
+    for gm_entry, instrument in zip(general_midi_instruments.GM_INSTRUMENTS, settings.INSTRUMENTS):
+        assert isinstance(instrument, tuple) and instrument[1:2] + instrument[3:] == tuple(gm_entry[1:2] + gm_entry[3:])
+        assert settings.get_instrument_by_id(instrument[const.INSTRUMENT_ID_INDX]) == \
+            [i for i in settings.INSTRUMENTS if i[const.INSTRUMENT_ID_INDX] == instrument[const.INSTRUMENT_ID_INDX]][0]
+        assert settings.get_instrument_by_name_and_property(*instrument[0:1] + instrument[3:5]) == \
+            [i for i in settings.INSTRUMENTS if i[0:1] + i[3:5] == instrument[0:1] + instrument[3:5]][0]
+
+    # random selection uses the same random numbers as the linear scan of the definitions
+    for properties, instruments in settings.INSTRUMENTS_BY_PROPERTY.items():
+        assert list(instruments) == [i for i in settings.INSTRUMENTS if i[3:5] == properties and not (
+            mp.LOGIC_PRO_MIDI_SETTINGS and i[const.INSTRUMENT_ID_INDX] in settings.BLOCK_FOR_LOGIC_PRO_LIST)]
+        rndm_2 = webutilities.create_rndm_classes(1, 1)
+        selected = [settings.get_instrument_by_property(*properties, rndm_2) for _ in range(5)]
+        rndm_2 = webutilities.create_rndm_classes(1, 1)
+        assert selected == [instruments[rndm_2[const.RNDM_INSTRU].rndm_int(1, len(instruments)) - 1] for _ in range(5)]